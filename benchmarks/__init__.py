@@ -0,0 +1,17 @@
+"""airspeed velocity (asv) benchmarks for small_circles.
+
+Run from the repository root with ``asv run --quick`` or
+``asv run --python=same``, which benchmarks the working tree in the
+current environment. Hot paths are timed (``time_``) and their peak
+memory recorded (``peakmem_``) over SIZES vectors, or the subset of them
+whose outputs fit in memory.
+"""
+
+import os
+import sys
+
+# small_circles is a single module, not an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# number of vectors of the scaling benchmarks
+SIZES = [10 ** i for i in range(2, 8)]
@@ -0,0 +1,57 @@
+import numpy as np
+
+import small_circles
+from small_circles import dcos_line, sphere_line
+
+from . import SIZES
+
+
+class Conversions:
+    """Attitude to direction cosine conversions and back."""
+
+    params = SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        rng = np.random.default_rng(0)
+        self.attitudes = rng.uniform((0.0, 0.0), (360.0, 90.0), (n, 2))
+        self.dcos = dcos_line(self.attitudes)
+
+    def time_dcos_line(self, n):
+        dcos_line(self.attitudes)
+
+    def time_sphere_line(self, n):
+        sphere_line(self.dcos)
+
+    def peakmem_dcos_line(self, n):
+        dcos_line(self.attitudes)
+
+    def peakmem_sphere_line(self, n):
+        sphere_line(self.dcos)
+
+
+class Projections:
+    """Direct and inverse transforms of each projection, with a rotation
+    so the direct one pays for it too."""
+
+    params = (["EqualArea", "EqualAngle", "Orthographic"], SIZES)
+    param_names = ["projection", "n"]
+
+    def setup(self, projection, n):
+        rng = np.random.default_rng(0)
+        self.projection = getattr(small_circles, projection)((30, 45, 10))
+        self.data = rng.normal(size=(n, 3))
+        X, Y = self.projection.direct(self.data)
+        self.projected = np.column_stack((X, Y))
+
+    def time_direct(self, projection, n):
+        self.projection.direct(self.data)
+
+    def time_inverse(self, projection, n):
+        self.projection.inverse(self.projected)
+
+    def peakmem_direct(self, projection, n):
+        self.projection.direct(self.data)
+
+    def peakmem_inverse(self, projection, n):
+        self.projection.inverse(self.projected)
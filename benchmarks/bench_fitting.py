@@ -0,0 +1,94 @@
+from math import degrees, radians
+
+import numpy as np
+
+from small_circles import (
+    Vector,
+    fit_cone,
+    fit_cone_ransac,
+    fit_girdle,
+    fit_small_circle,
+    sample_fisher,
+    sample_uniform,
+)
+
+from . import SIZES
+
+
+def _synthetic_cone(axis, alpha, A, B, n, kappa, outliers=0):
+    """n vectors scattered with Fisher noise of concentration kappa around
+    a cone, a third of them flipped as axial data, plus uniform
+    outliers."""
+    rng = np.random.default_rng(0)
+    circle = axis.get_small_circle(alpha, A, B, step=2 * np.pi / n)[0]
+    data = np.array(sample_fisher(circle, kappa, 1, random_state=rng)[:, 0])
+    data[::3] *= -1
+    return np.vstack((data, sample_uniform(outliers, random_state=rng)))
+
+
+class FitCone:
+    """Cone fitting on synthetic cones, with the axis error, in degrees,
+    of each fit tracked against the one of the eigenvector solution."""
+
+    params = [False, True]
+    param_names = ["elliptical"]
+
+    def setup(self, elliptical):
+        self.axis = Vector((0.2, 0.3, -0.9))
+        self.axis /= self.axis.length
+        A, B = (radians(5.0), radians(-3.0)) if elliptical else (0.0, 0.0)
+        self.data = _synthetic_cone(
+            self.axis, radians(40.0), A, B, 1000, 2000.0
+        )
+        self.noisy = _synthetic_cone(
+            self.axis, radians(40.0), A, B, 500, 2000.0, outliers=500
+        )
+
+    def _axis_error(self, axis):
+        return degrees(np.arccos(min(1.0, abs(np.dot(axis, self.axis)))))
+
+    def time_fit_cone(self, elliptical):
+        fit_cone(self.data, elliptical=elliptical)
+
+    def time_fit_cone_ransac(self, elliptical):
+        fit_cone_ransac(
+            self.noisy,
+            threshold=radians(3.0),
+            elliptical=elliptical,
+            random_state=0,
+        )
+
+    def track_fit_small_circle_error(self, elliptical):
+        return self._axis_error(fit_small_circle(self.data))
+
+    def track_fit_cone_error(self, elliptical):
+        return self._axis_error(fit_cone(self.data, elliptical=elliptical)[0])
+
+    def track_fit_cone_ransac_error(self, elliptical):
+        return self._axis_error(
+            fit_cone_ransac(
+                self.noisy,
+                threshold=radians(3.0),
+                elliptical=elliptical,
+                random_state=0,
+            )[0]
+        )
+
+
+class FitGirdle:
+    """Eigenvector fits over growing datasets."""
+
+    params = SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.data = np.random.default_rng(0).normal(size=(n, 3))
+
+    def time_fit_girdle(self, n):
+        fit_girdle(self.data)
+
+    def time_fit_small_circle(self, n):
+        fit_small_circle(self.data)
+
+    def peakmem_fit_girdle(self, n):
+        fit_girdle(self.data)
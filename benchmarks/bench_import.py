@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SETUP = "import sys; sys.path.insert(0, {!r})".format(ROOT)
+
+
+def timeraw_import_small_circles():
+    """import time of the module in a fresh interpreter."""
+    return "import small_circles", SETUP + "; import numpy"
+
+
+def track_matplotlib_modules_imported():
+    """number of matplotlib modules loaded by importing the module, which
+    should stay at 0 so compute workers don't pay for matplotlib."""
+    code = (
+        SETUP + "; import small_circles; "
+        "print(sum(m.split('.')[0] == 'matplotlib' for m in sys.modules))"
+    )
+    return int(subprocess.check_output([sys.executable, "-c", code]))
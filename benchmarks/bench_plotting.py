@@ -0,0 +1,283 @@
+from math import radians
+
+import numpy as np
+
+import small_circles
+from small_circles import (
+    ProjectionPlot,
+    SphericalGrid,
+    Vector,
+    VectorSet,
+    build_rotation_matrix,
+    sample_fisher,
+)
+
+from . import SIZES
+
+
+def _join_segments_reference(segments, c_tol=radians(1.0)):
+    """the previous pop/append implementation of
+    ProjectionPlot._join_segments, kept for regression tracking."""
+    segments = list(segments)
+    all_joined = False
+    while not all_joined and len(segments) > 1:
+        all_joined = True
+        segment = segments.pop(0)
+        first, last = Vector(segment[0]), Vector(segment[-1])
+        if abs(last.angle_with(segments[0][0])) < c_tol:
+            segment = np.concatenate((segment, segments.pop(0)))
+            all_joined = False
+        elif abs(first.angle_with(segments[0][-1])) < c_tol:
+            segment = np.concatenate((segments.pop(0), segment))
+            all_joined = False
+        elif abs(last.angle_with(segments[0][-1])) < c_tol:
+            segment = np.concatenate((segment, segments.pop(0)[::-1]))
+            all_joined = False
+        elif abs(first.angle_with(segments[0][0])) < c_tol:
+            segment = np.concatenate((segments.pop(0), segment[::-1]))
+            all_joined = False
+        segments.append(segment)
+    return segments
+
+
+def _signature(segments):
+    return sorted(
+        (len(segment), tuple(np.round(np.sum(segment, axis=0), 6)))
+        for segment in segments
+    )
+
+
+class JoinSegments:
+    """Joining of clipped great and small circles under random
+    rotations, plus one circle cut into many shuffled pieces."""
+
+    n_rotations = 200
+
+    def setup(self):
+        rng = np.random.RandomState(0)
+        step = radians(0.5)
+        self.cases = []
+        for _ in range(self.n_rotations):
+            R = build_rotation_matrix(*rng.uniform(0.0, 360.0, 3))
+            axis = Vector(rng.normal(size=3))
+            axis /= axis.length
+            circles = (
+                axis.get_great_circle(step)
+                + axis.get_small_circle(radians(40.0), step=step)
+                + axis.get_small_circle(
+                    radians(60.0), radians(20.0), radians(10.0), step=step
+                )
+            )
+            for circle in circles:
+                rotated = VectorSet(np.dot(circle, R.T))
+                self.cases.append(ProjectionPlot._clip_lines(rotated))
+        circle = np.asarray(Vector((0.0, 0.0, -1.0)).get_great_circle(step)[0])
+        pieces = np.array_split(circle, 100)
+        self.pieces = [pieces[i] for i in rng.permutation(len(pieces))]
+
+    def time_join_rotated_circles(self):
+        for segments in self.cases:
+            ProjectionPlot._join_segments(segments)
+
+    def time_join_many_pieces(self):
+        ProjectionPlot._join_segments(self.pieces)
+
+    def track_mismatches(self):
+        """number of rotated circles, clipped into at most two segments,
+        joined differently from the previous implementation. Should stay
+        at 0. With more segments the previous implementation only joined
+        neighbouring ones, see track_unjoined_gaps."""
+        return sum(
+            _signature(ProjectionPlot._join_segments(segments))
+            != _signature(_join_segments_reference(segments))
+            for segments in self.cases
+            if len(segments) <= 2
+        )
+
+    def track_unjoined_gaps(self):
+        """number of endpoint pairs of different joined segments still
+        closer than the joining tolerance. Should stay at 0."""
+        gaps = 0
+        for segments in self.cases + [self.pieces]:
+            joined = ProjectionPlot._join_segments(segments)
+            ends = VectorSet([end for s in joined for end in (s[0], s[-1])])
+            angles = ends.angle_with(ends)
+            owner = np.arange(len(ends)) // 2
+            gaps += np.sum(
+                np.triu(angles < radians(1.0)) & (owner[:, None] != owner)
+            )
+        return int(gaps)
+
+
+class AdaptiveSampling:
+    """Vertex counts and rendering times of many great circles and of
+    the reference net, sampled with the fixed 1 degree step or adaptively
+    to half a pixel of a 6 inch, 100 dpi diagram."""
+
+    params = ["EqualArea", "EqualAngle"]
+    param_names = ["projection"]
+
+    def setup(self, projection):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.figure = Figure(figsize=(6.0, 6.0), dpi=100)
+        FigureCanvasAgg(self.figure)
+        self.plot = ProjectionPlot(
+            self.figure.add_subplot(111),
+            getattr(small_circles, projection),
+        )
+        self.tolerance = self.plot.pixel_tolerance(0.5)
+        rng = np.random.RandomState(0)
+        self.planes = VectorSet(rng.normal(size=(2000, 3)))
+
+    def _circles(self, adaptive):
+        if adaptive:
+            return self.planes.great_circles(
+                tolerance=self.tolerance, projection=self.plot.projection
+            )
+        return self.planes.great_circles()
+
+    def _net(self, adaptive):
+        return ProjectionPlot._net_lines(
+            self.plot.projection,
+            10.0,
+            10.0,
+            360,
+            True,
+            self.tolerance if adaptive else None,
+        )
+
+    def track_circle_vertices_fixed(self, projection):
+        return sum(len(line) for line in self._circles(False))
+
+    def track_circle_vertices_adaptive(self, projection):
+        return sum(len(line) for line in self._circles(True))
+
+    def track_net_vertices_fixed(self, projection):
+        gc, sc = self._net(False)
+        return sum(len(line) for line in gc + sc)
+
+    def track_net_vertices_adaptive(self, projection):
+        gc, sc = self._net(True)
+        return sum(len(line) for line in gc + sc)
+
+    def _render(self, adaptive):
+        self.plot.clear_diagram()
+        self.plot.as_lines(self._circles(adaptive))
+        gc, sc = self._net(adaptive)
+        self.plot._add_lines(gc, self.plot.net_gc_defaults)
+        self.plot._add_lines(sc, self.plot.net_sc_defaults)
+        self.figure.canvas.draw()
+
+    def time_render_fixed(self, projection):
+        self._render(False)
+
+    def time_render_adaptive(self, projection):
+        self._render(True)
+
+
+def _agg_plot(projection):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(6.0, 6.0), dpi=100)
+    FigureCanvasAgg(figure)
+    return figure, ProjectionPlot(figure.add_subplot(111), projection)
+
+
+class Lines:
+    """as_lines on great circles of 360 vertices adding up to n vertices,
+    alone and drawn with Agg. Sizes stop at 10**6 vertices, about 2800
+    circles."""
+
+    params = [n for n in SIZES if n <= 10 ** 6]
+    param_names = ["n"]
+    timeout = 300
+
+    def setup(self, n):
+        self.figure, self.plot = _agg_plot(small_circles.EqualArea)
+        rng = np.random.default_rng(0)
+        planes = VectorSet(rng.normal(size=(max(1, n // 360), 3)))
+        self.circles = planes.great_circles()
+
+    def time_as_lines(self, n):
+        self.plot.clear_diagram()
+        self.plot.as_lines(self.circles)
+
+    def time_as_lines_draw(self, n):
+        self.plot.clear_diagram()
+        self.plot.as_lines(self.circles)
+        self.figure.canvas.draw()
+
+    def peakmem_as_lines(self, n):
+        self.plot.as_lines(self.circles)
+
+
+class BaseNet:
+    """Reference net of each projection, rotated, computed anew and from
+    net_cache, and drawn with Agg."""
+
+    params = ["EqualArea", "EqualAngle", "Orthographic"]
+    param_names = ["projection"]
+
+    def setup(self, projection):
+        self.figure, self.plot = _agg_plot(
+            getattr(small_circles, projection)((30.0, 45.0, 10.0))
+        )
+        self.plot.base_net()
+
+    def time_base_net(self, projection):
+        self.plot.clear_diagram()
+        self.plot.base_net(cache=False)
+
+    def time_base_net_cached(self, projection):
+        self.plot.clear_diagram()
+        self.plot.base_net()
+
+    def time_base_net_draw(self, projection):
+        self.plot.clear_diagram()
+        self.plot.base_net()
+        self.figure.canvas.draw()
+
+    def peakmem_base_net(self, projection):
+        self.plot.base_net(cache=False)
+
+
+class Contours:
+    """as_contours of Kamb counts of 10**4 vectors at each raster
+    resolution, with the interpolation weights computed anew and from
+    contour_cache, and drawn with Agg."""
+
+    params = [100, 250, 500]
+    param_names = ["resolution"]
+
+    def setup(self, resolution):
+        self.figure, self.plot = _agg_plot(small_circles.EqualArea)
+        self.grid = SphericalGrid.default()
+        data = sample_fisher((0.2, 0.3, -0.9), 10.0, 10 ** 4, random_state=0)
+        self.count = self.grid.count_kamb(data)
+        self.plot.as_contours(
+            self.grid.nodes, self.count, len(data), resolution=resolution
+        )
+
+    def _contour(self, resolution):
+        self.plot.clear_diagram()
+        self.plot.as_contours(
+            self.grid.nodes, self.count, 10 ** 4, resolution=resolution
+        )
+
+    def time_as_contours(self, resolution):
+        ProjectionPlot.contour_cache.clear()
+        self._contour(resolution)
+
+    def time_as_contours_cached(self, resolution):
+        self._contour(resolution)
+
+    def time_as_contours_draw(self, resolution):
+        self._contour(resolution)
+        self.figure.canvas.draw()
+
+    def peakmem_as_contours(self, resolution):
+        ProjectionPlot.contour_cache.clear()
+        self._contour(resolution)
@@ -0,0 +1,31 @@
+import numpy as np
+
+from small_circles import sample_fisher, sample_uniform
+
+from . import SIZES
+
+
+class Samplers:
+    """von Mises-Fisher, around one and many means, and uniform samples."""
+
+    params = SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.mean = np.array((0.2, 0.3, -0.9))
+        self.means = np.random.default_rng(0).normal(size=(100, 3))
+
+    def time_sample_fisher(self, n):
+        sample_fisher(self.mean, 20.0, n, random_state=0)
+
+    def time_sample_fisher_many_means(self, n):
+        sample_fisher(self.means, 20.0, n // 100, random_state=0)
+
+    def time_sample_uniform(self, n):
+        sample_uniform(n, random_state=0)
+
+    def peakmem_sample_fisher(self, n):
+        sample_fisher(self.mean, 20.0, n, random_state=0)
+
+    def peakmem_sample_uniform(self, n):
+        sample_uniform(n, random_state=0)
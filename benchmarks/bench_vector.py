@@ -0,0 +1,86 @@
+from math import radians
+
+import numpy as np
+
+from small_circles import VectorSet
+
+from . import SIZES
+
+
+class VectorProperties:
+    """Vector-heavy loops relying on the derived properties of Vector,
+    both on fresh row views and on Vectors whose properties are already
+    cached."""
+
+    def setup(self):
+        rng = np.random.RandomState(0)
+        self.data = VectorSet(rng.normal(size=(2000, 3)))
+        self.vectors = list(self.data)
+
+    @staticmethod
+    def _loop(vectors):
+        for vector in vectors:
+            vector.get_small_circle(radians(30.0), step=radians(10.0))
+            vector.get_rotation_matrix(radians(30.0))
+            vector.arc_to(-vector.dip_vector, step=radians(10.0))
+            vector.attitude
+
+    def time_fresh_vectors(self):
+        self._loop(self.data)
+
+    def time_cached_vectors(self):
+        self._loop(self.vectors)
+
+
+class PairwiseAngles:
+    """Angles between each vector and 10 others. Sizes stop at 10**6,
+    whose (n, 10) output alone takes 80 MB."""
+
+    params = ([n for n in SIZES if n <= 10 ** 6], [False, True])
+    param_names = ["n", "precise"]
+
+    def setup(self, n, precise):
+        rng = np.random.default_rng(0)
+        self.data = VectorSet(rng.normal(size=(n, 3)))
+        self.other = rng.normal(size=(10, 3))
+
+    def time_angle_with(self, n, precise):
+        self.data.angle_with(self.other, precise)
+
+    def peakmem_angle_with(self, n, precise):
+        self.data.angle_with(self.other, precise)
+
+
+class NormalizedCross:
+    """Normalized cross products of each vector with 10 others."""
+
+    params = [n for n in SIZES if n <= 10 ** 6]
+    param_names = ["n"]
+
+    def setup(self, n):
+        rng = np.random.default_rng(0)
+        self.data = VectorSet(rng.normal(size=(n, 3)))
+        self.other = rng.normal(size=(10, 3))
+
+    def time_normalized_cross_with(self, n):
+        self.data.normalized_cross_with(self.other)
+
+    def peakmem_normalized_cross_with(self, n):
+        self.data.normalized_cross_with(self.other)
+
+
+class NormalizedCrossPairs:
+    """Normalized cross products of all unique pairs within a set, whose
+    output grows as n**2."""
+
+    params = [100, 1000, 3000]
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.data = VectorSet(np.random.default_rng(0).normal(size=(n, 3)))
+
+    def time_normalized_cross_unique_pairs(self, n):
+        self.data.normalized_cross_with(unique=True)
+
+    def peakmem_normalized_cross_unique_pairs(self, n):
+        self.data.normalized_cross_with(unique=True)
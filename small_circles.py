@@ -1,12 +1,15 @@
 import abc
-from inspect import isclass
-from math import acos, asin, atan2, cos, degrees, pi, radians, sin, sqrt
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from contextlib import contextmanager
+from inspect import isclass, signature
+from itertools import islice
+from math import acos, asin, atan2, ceil, cos, degrees, pi, radians, sin, sqrt
+from timeit import default_timer
 
 import numpy as np
-from matplotlib import patheffects
-from matplotlib.collections import LineCollection
-from matplotlib.mlab import griddata
-from matplotlib.patches import Circle
 
 # http://treyhunner.com/2016/02/how-to-merge-dictionaries-in-python/
 try:
@@ -18,6 +21,120 @@ except ImportError:
         return dict(chain(*map(lambda d: d.items(), reversed(args))))
 
 
+# maximum number of values held by the temporary arrays of blockwise
+# computations, about 8MB of float64.
+BLOCK_ELEMENTS = 2 ** 20
+
+
+def _block_rows(row_size, block_size=None):
+    """Returns the number of rows processed at a time by blockwise
+    computations whose temporaries hold row_size values per row."""
+    if block_size is not None:
+        return max(1, int(block_size))
+    return max(1, BLOCK_ELEMENTS // max(1, row_size))
+
+
+def _cached_property(method):
+    """Property computed once and cached on the instance until its data
+    changes, which is detected by comparing the bytes of the data with
+    the ones the cached values were computed from. Cached arrays are
+    made read-only, so that they can't be changed in place."""
+    name = method.__name__
+
+    def getter(self):
+        key = self.tobytes()
+        cache = self.__dict__.get("_cache")
+        if cache is None or cache[0] != key:
+            cache = self.__dict__["_cache"] = (key, {})
+        values = cache[1]
+        if name not in values:
+            value = method(self)
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+            values[name] = value
+        return values[name]
+
+    getter.__doc__ = method.__doc__
+    return property(getter)
+
+
+# recorder of the active instrument block. While it is None the
+# instrumented stages only pay for checking it.
+_recorder = None
+
+
+class StageRecorder(object):
+    """Number of calls, wall time and counters, such as vectors, vertices,
+    segments and bytes allocated, of each instrumented stage, collected
+    in stats. Stages may run inside others, such as direct inside
+    project_lines, so their times overlap.
+
+    Parameters:
+        callback: Optional callable, called as callback(stage, seconds,
+        counters) as each stage completes.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.stats = OrderedDict()
+
+    def record(self, stage, seconds, **counters):
+        stats = self.stats.get(stage)
+        if stats is None:
+            stats = self.stats[stage] = {"calls": 0, "seconds": 0.0}
+        stats["calls"] += 1
+        stats["seconds"] += seconds
+        for name, value in counters.items():
+            stats[name] = stats.get(name, 0) + value
+        if self.callback is not None:
+            self.callback(stage, seconds, counters)
+
+    def report(self):
+        """Returns a table of the recorded stages, slowest first."""
+        lines = []
+        for stage, stats in sorted(
+            self.stats.items(), key=lambda item: -item[1]["seconds"]
+        ):
+            counters = ", ".join(
+                "{}={}".format(name, value)
+                for name, value in stats.items()
+                if name not in ("calls", "seconds")
+            )
+            lines.append(
+                "{:<20}{:>8} calls{:>10.4f} s  {}".format(
+                    stage, stats["calls"], stats["seconds"], counters
+                )
+            )
+        return "\n".join(lines)
+
+
+@contextmanager
+def instrument(callback=None):
+    """Context manager recording the stages of projection, plotting and
+    fitting run inside it, such as direct, clip, join, project_lines,
+    contour_weights, collection or fit_girdle. Yields the StageRecorder,
+    whose report method summarizes them. callback is passed to it.
+    Instrumentation is off outside of these blocks."""
+    global _recorder
+    previous, _recorder = _recorder, StageRecorder(callback)
+    try:
+        yield _recorder
+    finally:
+        _recorder = previous
+
+
+def _stage_start():
+    """start time of an instrumented stage, None if instrumentation is
+    off."""
+    return None if _recorder is None else default_timer()
+
+
+def _stage_end(stage, start, **counters):
+    """records a stage started with _stage_start."""
+    if _recorder is not None:
+        _recorder.record(stage, default_timer() - start, **counters)
+
+
 def dcos_line(trend_plunge):
     tr, pl = np.transpose(np.radians(trend_plunge))  # trend, plunge
     return np.array(
@@ -37,6 +154,29 @@ def sphere_line(dcos_data):
     ).T
 
 
+def dcos_plane(dipdirection_dip):
+    dd, d = np.transpose(np.radians(dipdirection_dip))  # dip direction, dip
+    return np.array(
+        (-np.sin(d) * np.sin(dd), -np.sin(d) * np.cos(dd), -np.cos(d))
+    ).T
+
+
+def sphere_plane(dcos_data):
+    tr, pl = np.transpose(sphere_line(dcos_data))
+    return np.array(((tr + 180.0) % 360, 90.0 - pl)).T
+
+
+def dcos_strike(strike_dip):
+    """right hand rule strike/dip to direction cosines of the poles."""
+    st, d = np.transpose(strike_dip)
+    return dcos_plane(np.transpose(((st + 90.0) % 360, d)))
+
+
+def sphere_strike(dcos_data):
+    dd, d = np.transpose(sphere_plane(dcos_data))
+    return np.array(((dd - 90.0) % 360, d)).T
+
+
 def normalized_cross(a, b):
     c = np.cross(a, b)
     length = sqrt(c.dot(c))
@@ -73,19 +213,809 @@ def build_rotation_matrix(azim, plng, rake):
     return R3.dot(R2).dot(R1)
 
 
+def build_rotation_matrices(azim, plng, rake):
+    """Returns the (k, 3, 3) stack of rotation matrices of
+    build_rotation_matrix for array-likes of azimuths, plunges and rakes,
+    in degrees, broadcast against each other."""
+    azim, plng, rake = (
+        np.radians(angles).ravel()
+        for angles in np.broadcast_arrays(azim, plng, rake)
+    )
+    k = azim.size
+    R1, R2, R3 = np.zeros((3, k, 3, 3))
+    R1[:, 0, 0] = R1[:, 2, 2] = np.cos(rake)
+    R1[:, 0, 2] = np.sin(rake)
+    R1[:, 2, 0] = -R1[:, 0, 2]
+    R1[:, 1, 1] = 1.0
+    R2[:, 1, 1] = R2[:, 2, 2] = np.cos(plng)
+    R2[:, 1, 2] = np.sin(plng)
+    R2[:, 2, 1] = -R2[:, 1, 2]
+    R2[:, 0, 0] = 1.0
+    R3[:, 0, 0] = R3[:, 1, 1] = np.cos(azim)
+    R3[:, 0, 1] = np.sin(azim)
+    R3[:, 1, 0] = -R3[:, 0, 1]
+    R3[:, 2, 2] = 1.0
+    return np.matmul(np.matmul(R3, R2), R1)
+
+
+def rotation_matrices(axes, angles):
+    """Returns the (k, 3, 3) stack of matrices of the rotations by angles,
+    in radians, about axes, as Vector.get_rotation_matrix. Axes are
+    normalized first.
+
+    Parameters:
+        axes: (k, 3) or (3,) array-like of rotation axes.
+        angles: (k,) array-like or scalar of rotation angles.
+    """
+    axes = np.reshape(np.asarray(axes, dtype=float), (-1, 3))
+    axes = axes / np.linalg.norm(axes, axis=1)[:, None]
+    angles = np.reshape(np.asarray(angles, dtype=float), (-1,))
+    axes, angles = np.broadcast_arrays(axes, angles[:, None])
+    angles = angles[:, 0]
+    cos_angles, sin_angles = np.cos(angles), np.sin(angles)
+    x, y, z = axes.T
+    matrices = (1 - cos_angles)[:, None, None] * (
+        axes[:, :, None] * axes[:, None, :]
+    )
+    matrices[:, 0, 0] += cos_angles
+    matrices[:, 1, 1] += cos_angles
+    matrices[:, 2, 2] += cos_angles
+    matrices[:, 0, 1] -= sin_angles * z
+    matrices[:, 0, 2] += sin_angles * y
+    matrices[:, 1, 0] += sin_angles * z
+    matrices[:, 1, 2] -= sin_angles * x
+    matrices[:, 2, 0] -= sin_angles * y
+    matrices[:, 2, 1] += sin_angles * x
+    return matrices
+
+
+def rotate(data, axes, angles, block_size=None):
+    """Rotates each vector of data by its angle, in radians, about its
+    axis with Rodrigues' formula, in blocks of rows. Axes are normalized
+    first. Returns a VectorSet.
+
+    Parameters:
+        data: (n, 3) array-like of vectors.
+        axes: (n, 3) array-like of rotation axes, or a single (3,) axis.
+        angles: (n,) array-like of rotation angles, or a single angle.
+        block_size: Number of rows rotated at a time. If None, it is
+        chosen so that temporaries hold about BLOCK_ELEMENTS values.
+    """
+    data = np.reshape(data, (-1, 3))
+    axes = np.asarray(axes, dtype=float)
+    axes = axes / np.linalg.norm(axes, axis=-1)[..., None]
+    axes = np.broadcast_to(axes, data.shape)
+    angles = np.broadcast_to(np.asarray(angles, dtype=float), data.shape[:1])
+    rotated = np.empty(data.shape)
+    step = _block_rows(9, block_size)
+    for start in range(0, len(data), step):
+        block = np.asarray(data[start : start + step], dtype=float)
+        axis = axes[start : start + step]
+        angle = angles[start : start + step, None]
+        cos_angle = np.cos(angle)
+        rotated[start : start + step] = (
+            block * cos_angle
+            + np.cross(axis, block) * np.sin(angle)
+            + axis
+            * (np.einsum("ij,ij->i", axis, block)[:, None] * (1 - cos_angle))
+        )
+    return VectorSet(rotated)
+
+
+def _chord_errors(first, middle, last, projection=None, z_tol=0.1):
+    """distance between the middle points of curve intervals and their
+    chords, measured on the projected lines if projection is given. For
+    intervals crossing out of the primitive the chord length is used, so
+    the crossing is located within the same tolerance, and intervals
+    wholly outside are never refined."""
+    if projection is None:
+        return np.linalg.norm(middle - (first + last) / 2, axis=1)
+    points = np.dot(np.stack((first, middle, last)), projection.R.T)
+    inside = points[..., 2] < z_tol
+    projected = np.zeros(points.shape[:-1] + (2,))
+    projected[inside] = np.transpose(
+        projection.direct(points[inside], invert_positive=False, rotate=False)
+    )
+    errors = np.linalg.norm(
+        projected[1] - (projected[0] + projected[2]) / 2, axis=1
+    )
+    crossing = ~inside.all(axis=0)
+    errors[crossing] = np.linalg.norm(last - first, axis=1)[crossing]
+    errors[~inside.any(axis=0)] = 0.0
+    return errors
+
+
+def _adaptive_sample(
+    curve,
+    k,
+    start,
+    stop,
+    tolerance,
+    projection=None,
+    z_tol=0.1,
+    step=radians(10.0),
+    max_depth=20,
+):
+    """samples k parametric curves from start to stop, bisecting the
+    intervals of all of them at once until their chord error is below
+    tolerance, see _chord_errors. curve(index, t) returns the (m, 3)
+    points of the curves index at parameters t. Returns a list of k (n, 3)
+    arrays."""
+    stage = _stage_start()
+    start = np.broadcast_to(np.asarray(start, dtype=float), (k,))
+    stop = np.broadcast_to(np.asarray(stop, dtype=float), (k,))
+    counts = np.maximum(np.ceil((stop - start) / step).astype(int), 1)
+    index = np.repeat(np.arange(k), counts)
+    position = np.arange(len(index)) - np.repeat(
+        np.cumsum(counts) - counts, counts
+    )
+    width = ((stop - start) / counts)[index]
+    t0 = start[index] + position * width
+    t1 = t0 + width
+    p0, p1 = curve(index, t0), curve(index, t1)
+    vertices = [(np.arange(k), stop, curve(np.arange(k), stop))]
+    for depth in range(max_depth + 1):
+        middle = (t0 + t1) / 2
+        pm = curve(index, middle)
+        split = _chord_errors(p0, pm, p1, projection, z_tol) > tolerance
+        if depth == max_depth:
+            split[:] = False
+        vertices.append((index[~split], t0[~split], p0[~split]))
+        if not split.any():
+            break
+        index = np.concatenate((index[split], index[split]))
+        t0, t1 = (
+            np.concatenate((t0[split], middle[split])),
+            np.concatenate((middle[split], t1[split])),
+        )
+        p0, p1 = (
+            np.concatenate((p0[split], pm[split])),
+            np.concatenate((pm[split], p1[split])),
+        )
+    index, t, points = (np.concatenate(v) for v in zip(*vertices))
+    points = points[np.lexsort((t, index))]
+    if stage is not None:
+        _stage_end(
+            "adaptive_sample",
+            stage,
+            curves=k,
+            vertices=len(points),
+            bytes=points.nbytes,
+        )
+    return np.split(points, np.cumsum(np.bincount(index, minlength=k))[:-1])
+
+
+def _trigonometric_curve(centers, cosines, sines):
+    """curve function, for _adaptive_sample, of the circles and arcs
+    centers + cosines cos(t) + sines sin(t), given (k, 3) arrays."""
+
+    def curve(index, t):
+        return (
+            centers[index]
+            + cosines[index] * np.cos(t)[:, None]
+            + sines[index] * np.sin(t)[:, None]
+        )
+
+    return curve
+
+
+def _sample_curves(
+    centers,
+    cosines,
+    sines,
+    start,
+    stop,
+    n=360,
+    tolerance=None,
+    projection=None,
+):
+    """samples the curves of _trigonometric_curve from start to stop,
+    either at n evenly spaced parameters, as a (k, n, 3) array, or
+    adaptively to tolerance, see _adaptive_sample, as a list of arrays."""
+    if tolerance is not None:
+        return _adaptive_sample(
+            _trigonometric_curve(centers, cosines, sines),
+            len(centers),
+            start,
+            stop,
+            tolerance,
+            projection,
+        )
+    t = np.linspace(start, stop, n, axis=-1)
+    return (
+        centers[:, None]
+        + cosines[:, None] * np.cos(t)[..., None]
+        + sines[:, None] * np.sin(t)[..., None]
+    )
+
+
+class OrientationAccumulator(object):
+    """Running orientation tensors of a stream of direction cosines.
+
+    Keeps the sum of outer products (the scatter matrix used by
+    fit_girdle) and the mean and centered sum of outer products (for the
+    covariance used by fit_small_circle), updated chunk by chunk with the
+    pairwise formulas of Chan et al., so memory use doesn't grow with the
+    data. Accumulators built on parts of the data, e.g. by parallel
+    workers, can be merged."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = np.zeros(3)
+        self.centered_sum = np.zeros((3, 3))
+        self.scatter = np.zeros((3, 3))
+
+    def _combine(self, n, mean, centered_sum, scatter):
+        if n == 0:
+            return self
+        total = self.n + n
+        delta = mean - self.mean
+        self.centered_sum += centered_sum + np.outer(delta, delta) * (
+            self.n * n / total
+        )
+        self.mean += delta * (n / total)
+        self.scatter += scatter
+        self.n = total
+        return self
+
+    def update(self, data):
+        """Adds an (n, 3) array-like of direction cosines, in blocks of
+        rows so it works over memory-mapped data. Returns self."""
+        data = np.reshape(data, (-1, 3))
+        step = _block_rows(3)
+        for start in range(0, len(data), step):
+            block = np.asarray(data[start : start + step], dtype=float)
+            mean = block.mean(axis=0)
+            centered = block - mean
+            self._combine(
+                len(block),
+                mean,
+                np.dot(centered.T, centered),
+                np.dot(block.T, block),
+            )
+        return self
+
+    def merge(self, other):
+        """Adds the data of another accumulator to this one. Returns
+        self."""
+        return self._combine(
+            other.n, other.mean, other.centered_sum, other.scatter
+        )
+
+    @property
+    def covariance(self):
+        return self.centered_sum / (self.n - 1)
+
+    @property
+    def eigenvalues(self):
+        """eigenvalues of the scatter matrix, in ascending order."""
+        return np.linalg.eigvalsh(self.scatter)
+
+    @staticmethod
+    def _minimum_axis(tensor):
+        eigenvalues, eigenvectors = np.linalg.eigh(tensor)
+        axis = Vector(eigenvectors[:, eigenvalues.argmin()])
+        return axis / axis.length
+
+    @property
+    def girdle_axis(self):
+        return self._minimum_axis(self.scatter)
+
+    @property
+    def small_circle_axis(self):
+        return self._minimum_axis(self.covariance)
+
+
+def _direction_tensor(data, centered=False):
+    """sum of the outer products of an (n, 3) array-like with itself,
+    accumulated in blocks of rows so it works over memory-mapped data.
+    If centered, the covariance matrix is returned instead."""
+    if centered:
+        return OrientationAccumulator().update(data).covariance
+    data = np.reshape(data, (-1, 3))
+    scatter = np.zeros((3, 3))
+    step = _block_rows(3)
+    for start in range(0, len(data), step):
+        block = np.asarray(data[start : start + step], dtype=float)
+        scatter += np.dot(block.T, block)
+    return scatter
+
+
 def fit_girdle(data):
-    direction_tensor = np.dot(np.transpose(data), data)
+    start = _stage_start()
+    direction_tensor = _direction_tensor(data)
     eigenvalues, eigenvectors = np.linalg.eigh(direction_tensor)
     axis = Vector(eigenvectors[:, eigenvalues.argmin()])
+    if start is not None:
+        _stage_end("fit_girdle", start, vectors=np.size(data) // 3)
     return axis/axis.length
 
 
 def fit_small_circle(data):
-    eigenvalues, eigenvectors = np.linalg.eigh(np.cov(data, rowvar=False))
+    start = _stage_start()
+    covariance = _direction_tensor(data, centered=True)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
     axis = Vector(eigenvectors[:, eigenvalues.argmin()])
+    if start is not None:
+        _stage_end("fit_small_circle", start, vectors=np.size(data) // 3)
     return axis/axis.length
 
 
+def _domain_labels(offsets, start, stop):
+    """domain index of the rows start to stop of data split by offsets."""
+    return np.searchsorted(offsets, np.arange(start, stop), "right") - 1
+
+
+def orientation_tensors(data, offsets=None, centered=False):
+    """Returns the (d, 3, 3) orientation tensors of many domains at once,
+    computed with a segmented reduction over blocks of rows.
+
+    Parameters:
+        data: Either an (n, 3) array-like with the direction cosines of
+        all domains concatenated, split by offsets, or a stacked (d, m, 3)
+        array-like of d domains of m vectors.
+        offsets: (d + 1,) array-like so that domain i is
+        data[offsets[i]:offsets[i + 1]], with offsets[0] = 0 and
+        offsets[-1] = n. Not used for stacked data.
+        centered: If True the covariance matrices of the domains, as
+        used by fit_small_circle, are returned instead of the sums of
+        outer products used by fit_girdle.
+
+    The tensors of domains with too few vectors, none, or fewer than two
+    if centered, are NaN.
+    """
+    start = _stage_start()
+    data = np.asarray(data, dtype=float)
+    if offsets is None:
+        if data.ndim != 3:
+            raise ValueError(
+                "offsets are required unless data is a stacked (d, m, 3) "
+                "array"
+            )
+        d, m = data.shape[:2]
+        offsets = np.arange(d + 1) * m
+    offsets = np.asarray(offsets, dtype=int)
+    d = len(offsets) - 1
+    lengths = np.diff(offsets)
+    data = data.reshape(-1, 3)
+    step = _block_rows(9)
+    blocks = [(i, min(i + step, len(data))) for i in range(0, len(data), step)]
+    means = np.zeros((d, 3))
+    if centered:
+        for first, stop in blocks:
+            labels = _domain_labels(offsets, first, stop)
+            for i in range(3):
+                means[:, i] += np.bincount(
+                    labels, data[first:stop, i], minlength=d
+                )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means /= lengths[:, None]
+    tensors = np.zeros((d, 3, 3))
+    for first, stop in blocks:
+        labels = _domain_labels(offsets, first, stop)
+        block = data[first:stop] - means[labels]
+        for i, j in ((0, 0), (0, 1), (0, 2), (1, 1), (1, 2), (2, 2)):
+            tensors[:, i, j] += np.bincount(
+                labels, block[:, i] * block[:, j], minlength=d
+            )
+    tensors[:, 1, 0] = tensors[:, 0, 1]
+    tensors[:, 2, 0] = tensors[:, 0, 2]
+    tensors[:, 2, 1] = tensors[:, 1, 2]
+    if centered:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            tensors /= (lengths - 1)[:, None, None]
+    tensors[lengths < (2 if centered else 1)] = np.nan
+    if start is not None:
+        _stage_end("orientation_tensors", start, vectors=len(data), domains=d)
+    return tensors
+
+
+def eigen_domains(data, offsets=None, centered=False):
+    """Returns the eigenvalues, as a (d, 3) array, and eigenvectors, as a
+    (d, 3, 3) array with eigenvectors[k, :, i] for eigenvalues[k, i], of
+    the orientation tensors of many domains, in ascending order as
+    np.linalg.eigh. Domains with too few vectors get NaN eigenvalues and
+    eigenvectors. See orientation_tensors for the parameters."""
+    tensors = orientation_tensors(data, offsets, centered)
+    valid = np.isfinite(tensors).all(axis=(1, 2))
+    eigenvalues = np.full(tensors.shape[:2], np.nan)
+    eigenvectors = np.full(tensors.shape, np.nan)
+    eigenvalues[valid], eigenvectors[valid] = np.linalg.eigh(tensors[valid])
+    return eigenvalues, eigenvectors
+
+
+def woodcock_parameters(eigenvalues):
+    """Returns the Woodcock (1977) shape K = ln(S1/S2)/ln(S2/S3) and
+    strength C = ln(S1/S3) parameters from (..., 3) eigenvalues of
+    orientation tensors in ascending order, as from eigen_domains."""
+    eigenvalues = np.asarray(eigenvalues, dtype=float)
+    S3, S2, S1 = np.moveaxis(eigenvalues, -1, 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.log(S1 / S2) / np.log(S2 / S3), np.log(S1 / S3)
+
+
+def fit_girdles(data, offsets=None):
+    """Returns the girdle axes of many domains, as fit_girdle, as a
+    VectorSet, NaN for empty domains. See orientation_tensors for the
+    parameters."""
+    eigenvalues, eigenvectors = eigen_domains(data, offsets)
+    return VectorSet(eigenvectors[:, :, 0])
+
+
+def fit_small_circles(data, offsets=None):
+    """Returns the small circle axes of many domains, as
+    fit_small_circle, as a VectorSet, NaN for domains with fewer than
+    two vectors. See orientation_tensors for the parameters."""
+    eigenvalues, eigenvectors = eigen_domains(data, offsets, centered=True)
+    return VectorSet(eigenvectors[:, :, 0])
+
+
+def _outer_products(data):
+    """(n, 6) unique components of the outer products of (n, 3) data with
+    itself, in the order xx, xy, xz, yy, yz, zz."""
+    i, j = np.triu_indices(3)
+    return data[:, i] * data[:, j]
+
+
+def _resampled_axes(sums, totals, products, centered):
+    """minimum eigenvector axes of the orientation tensors of resamples,
+    given their (r,) weight totals, (r, 3) weighted sums of vectors and
+    (r, 6) weighted sums of outer products."""
+    tensors = np.empty((len(products), 3, 3))
+    i, j = np.triu_indices(3)
+    tensors[:, i, j] = products
+    tensors[:, j, i] = products
+    if centered:
+        means = sums / totals[:, None]
+        tensors -= totals[:, None, None] * (
+            means[:, :, None] * means[:, None, :]
+        )
+        tensors /= (totals - 1)[:, None, None]
+    return np.linalg.eigh(tensors)[1][:, :, 0]
+
+
+def _bootstrap_chunk(data, products, centered, block_size, n_resamples, rng):
+    n = len(data)
+    axes = np.empty((n_resamples, 3))
+    step = _block_rows(2 * n, block_size)
+    for start in range(0, n_resamples, step):
+        rows = min(step, n_resamples - start)
+        # number of times each vector is drawn in each resample
+        draws = rng.integers(n, size=(rows, n)) + n * np.arange(rows)[:, None]
+        counts = np.bincount(draws.ravel(), minlength=rows * n)
+        counts = counts.reshape(rows, n).astype(float)
+        axes[start : start + rows] = _resampled_axes(
+            np.dot(counts, data),
+            np.full(rows, float(n)),
+            np.dot(counts, products),
+            centered,
+        )
+    return axes
+
+
+def confidence_cone(
+    data,
+    fit="girdle",
+    confidence=0.95,
+    n_resamples=1000,
+    jackknife=False,
+    seed=None,
+    processes=1,
+    chunk_size=100,
+    block_size=None,
+):
+    """Returns the axis fitted to data by fit_girdle or fit_small_circle,
+    the half apical angles of its confidence cones, in radians, and the
+    resampled axes, flipped towards the fitted one, as a VectorSet that
+    can be plotted with ProjectionPlot.as_points.
+
+    The orientation tensors of all resamples are computed together, as
+    products of resampling count matrices with the outer products of the
+    data, and decomposed with a stacked eigh. Bootstrap cones are the
+    confidence quantiles of the angles between resampled and fitted axes.
+    Jackknife cones take the leave-one-out variance of the axis as
+    isotropic, with a radius of sqrt(-ln(1 - confidence)) times its
+    standard deviation.
+
+    Parameters:
+        data: (n, 3) array-like of direction cosines.
+        fit: Either "girdle" or "small_circle".
+        confidence: Confidence level, or an array-like of them.
+        n_resamples: Number of bootstrap resamples.
+        jackknife: If True the n leave-one-out resamples are used instead
+        of bootstrap ones.
+        seed: Seed or np.random.SeedSequence of the bootstrap resamples.
+        Each chunk of resamples is drawn from its own child stream, so
+        the results don't depend on the number of processes.
+        processes: Number of worker processes. If None, the number of
+        CPUs is used; if 1, the resamples are computed in this process.
+        chunk_size: Number of bootstrap resamples sent to a worker at a
+        time.
+        block_size: Number of bootstrap resamples counted at a time. If
+        None, it is chosen so that their count matrices hold about
+        BLOCK_ELEMENTS values.
+    """
+    if fit not in ("girdle", "small_circle"):
+        raise ValueError("fit must be either 'girdle' or 'small_circle'")
+    start = _stage_start()
+    centered = fit == "small_circle"
+    data = np.reshape(np.asarray(data, dtype=float), (-1, 3))
+    axis = fit_small_circle(data) if centered else fit_girdle(data)
+    if centered:
+        # the covariances don't change, but the sums below lose less
+        # precision
+        data = data - data.mean(axis=0)
+    n = len(data)
+    if jackknife:
+        products = _outer_products(data)
+        axes = _resampled_axes(
+            data.sum(axis=0) - data,
+            np.full(n, n - 1.0),
+            products.sum(axis=0) - products,
+            centered,
+        )
+    else:
+        chunks = _seeded_chunks(
+            _bootstrap_chunk,
+            (data, _outer_products(data), centered, block_size),
+            n_resamples,
+            chunk_size,
+            seed,
+            processes,
+        )
+        axes = np.vstack(list(chunks))
+    axes *= np.where(np.dot(axes, axis) < 0, -1.0, 1.0)[:, None]
+    angles = np.arccos(np.clip(np.dot(axes, axis), -1.0, 1.0))
+    confidence = np.asarray(confidence, dtype=float)
+    if jackknife:
+        variance = (n - 1.0) / n * np.sum(angles ** 2)
+        half_angles = np.sqrt(-np.log(1.0 - confidence) * variance)
+    else:
+        half_angles = np.quantile(angles, confidence)
+    if start is not None:
+        _stage_end("confidence_cone", start, vectors=n, resamples=len(axes))
+    return axis, half_angles, VectorSet(axes)
+
+
+def _cone_axes(axis, reference, params):
+    """axes and reference azimuth vectors of the cones given by (m, k)
+    params (u, v, ...) as offsets of axis along reference and its normal,
+    with reference carried along to stay perpendicular to each axis."""
+    normal = np.cross(axis, reference)
+    axes = axis + params[:, :1] * reference + params[:, 1:2] * normal
+    axes /= np.linalg.norm(axes, axis=1)[:, None]
+    references = reference - np.sum(reference * axes, axis=1)[:, None] * axes
+    references /= np.linalg.norm(references, axis=1)[:, None]
+    return axes, references
+
+
+def _cone_residuals(data, axis, reference, params):
+    """(m, n) angular residuals of the (n, 3) data to the cones given by
+    (m, k) params (u, v, alpha[, A, B]), see _cone_axes. Data is taken as
+    axial, as the pair of circles of Vector.get_small_circle."""
+    axes, references = _cone_axes(axis, reference, params)
+    dots = np.abs(np.dot(axes, data.T))
+    alpha = params[:, 2:3]
+    if params.shape[1] > 3:
+        theta = np.arctan2(
+            np.dot(np.cross(axes, references), data.T),
+            np.dot(references, data.T),
+        )
+        alpha = (
+            alpha
+            + params[:, 3:4] * np.cos(2 * theta)
+            + params[:, 4:5] * np.sin(2 * theta)
+        )
+    return np.arccos(np.clip(dots, 0.0, 1.0)) - alpha
+
+
+def fit_cone(
+    data, weights=None, elliptical=False, axis=None, tol=1e-10, max_iter=50
+):
+    """Fits a cone to axial data by weighted least squares on the angular
+    residuals, with Gauss-Newton iterations. Returns the axis as a Vector,
+    the half apical angle alpha and the A and B ellipticity terms, in
+    radians, as used by Vector.get_small_circle.
+
+    Parameters:
+        data: (n, 3) array-like of direction cosines.
+        weights: Optional (n,) array-like of weights for each vector.
+        elliptical: If True A and B are fitted as well, else they are 0.
+        axis: Initial axis. Defaults to whichever of the eigenvectors of
+        the scatter matrix of data and fit_small_circle(data) has the
+        least spread of angles to data.
+        tol: Parameter change, in radians, below which the iterations
+        stop.
+        max_iter: Maximum number of iterations.
+    """
+    start = _stage_start()
+    data = np.reshape(np.asarray(data, dtype=float), (-1, 3))
+    data = data / np.linalg.norm(data, axis=1)[:, None]
+    if axis is None:
+        # the axis of a full cone of axial data is an eigenvector of its
+        # scatter matrix, fit_small_circle covers arcs of consistent sign
+        seeds = np.vstack(
+            (
+                np.linalg.eigh(_direction_tensor(data))[1].T,
+                fit_small_circle(data),
+            )
+        )
+        angles = np.arccos(np.clip(np.abs(np.dot(seeds, data.T)), 0.0, 1.0))
+        spread = np.average(
+            (angles - np.average(angles, axis=1, weights=weights)[:, None])
+            ** 2,
+            axis=1,
+            weights=weights,
+        )
+        axis = seeds[spread.argmin()]
+    axis = Vector(axis / np.linalg.norm(axis))
+    reference = np.asarray(axis.direction_vector)
+    axis = np.asarray(axis)
+    root_weights = np.ones(len(data)) if weights is None else np.sqrt(weights)
+    k = 5 if elliptical else 3
+    params = np.zeros(k)
+    params[2] = np.average(
+        np.arccos(np.clip(np.abs(np.dot(data, axis)), 0.0, 1.0)),
+        weights=weights,
+    )
+    residuals = _cone_residuals(data, axis, reference, params[None])[0]
+    cost = np.sum((root_weights * residuals) ** 2)
+    # all the finite difference steps are evaluated in a single call
+    h = 1e-7
+    trials = params + h * np.eye(k)
+    for _ in range(max_iter):
+        jacobian = (
+            _cone_residuals(data, axis, reference, trials) - residuals
+        ).T / h
+        delta = np.linalg.lstsq(
+            jacobian * root_weights[:, None],
+            -residuals * root_weights,
+            rcond=None,
+        )[0]
+        scale = 1.0
+        while scale > 1e-6:
+            step = params + scale * delta
+            step_residuals = _cone_residuals(
+                data, axis, reference, step[None]
+            )[0]
+            step_cost = np.sum((root_weights * step_residuals) ** 2)
+            if step_cost <= cost:
+                break
+            scale /= 2.0
+        else:
+            break
+        axes, references = _cone_axes(axis, reference, step[None])
+        axis, reference = axes[0], references[0]
+        params = step
+        params[:2] = 0.0
+        trials = params + h * np.eye(k)
+        residuals, cost = step_residuals, step_cost
+        if np.max(np.abs(scale * delta)) < tol:
+            break
+    if axis[2] > 0:
+        # lower hemisphere axis, flipping the sense of the azimuths
+        axis = -axis
+        params[4:] *= -1
+    axis = Vector(axis)
+    alpha, A, B = params[2], 0.0, 0.0
+    if elliptical:
+        # rotate the azimuth origin to the one of Vector.get_small_circle
+        direction = axis.direction_vector
+        phi = 2 * atan2(
+            np.dot(direction, np.cross(axis, reference)),
+            np.dot(direction, reference),
+        )
+        A = params[3] * cos(phi) + params[4] * sin(phi)
+        B = params[4] * cos(phi) - params[3] * sin(phi)
+    if start is not None:
+        _stage_end("fit_cone", start, vectors=len(data))
+    return axis, alpha, A, B
+
+
+def _cone_inliers(data, axis, alpha, A, B, threshold):
+    """mask of the vectors of data within threshold of a cone given as in
+    Vector.get_small_circle."""
+    axis = Vector(axis)
+    residuals = _cone_residuals(
+        data,
+        np.asarray(axis),
+        np.asarray(axis.direction_vector),
+        np.array([[0.0, 0.0, alpha, A, B]]),
+    )[0]
+    return np.abs(residuals) <= threshold
+
+
+def fit_cone_ransac(
+    data,
+    threshold=radians(2.0),
+    n_hypotheses=1000,
+    n_refine=8,
+    elliptical=False,
+    weights=None,
+    random_state=None,
+    block_size=None,
+):
+    """Fits a cone to axial data with outliers. Circular cones through
+    random triples of vectors are scored together by their number of
+    inliers, the best n_refine of them are refined with fit_cone over
+    their inliers, and the refined cone with most inliers is kept. Returns
+    axis, alpha, A and B as fit_cone and a boolean mask of the inliers.
+
+    Parameters:
+        data: (n, 3) array-like of direction cosines.
+        threshold: Largest angular residual, in radians, of an inlier.
+        n_hypotheses: Number of random triples tried.
+        n_refine: Number of best hypotheses refined.
+        elliptical: If True A and B are fitted as well, else they are 0.
+        weights: Optional (n,) array-like of weights for fit_cone.
+        random_state: Seed or np.random.Generator for the triples.
+        block_size: Number of hypotheses scored at a time. If None, it is
+        chosen so that their residuals hold about BLOCK_ELEMENTS values.
+
+    Raises ValueError if no triple of data defines a cone, as for fewer
+    than three distinct, non-opposite vectors.
+    """
+    start = _stage_start()
+    rng = np.random.default_rng(random_state)
+    data = np.reshape(np.asarray(data, dtype=float), (-1, 3))
+    data = data / np.linalg.norm(data, axis=1)[:, None]
+    if len(data) < 3:
+        raise ValueError("at least three vectors are needed to fit a cone")
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)
+    # random signs, as any of the axial pairs may lie on the cone
+    signs = rng.choice((-1.0, 1.0), size=(n_hypotheses, 3, 1))
+    points = data[rng.integers(len(data), size=(n_hypotheses, 3))] * signs
+    axes = np.cross(points[:, 1] - points[:, 0], points[:, 2] - points[:, 0])
+    lengths = np.linalg.norm(axes, axis=1)
+    valid = lengths > 1e-12
+    axes = axes[valid] / lengths[valid, None]
+    alphas = np.arccos(
+        np.clip(np.abs(np.sum(axes * points[valid, 0], axis=1)), 0.0, 1.0)
+    )
+    counts = np.empty(len(axes), dtype=int)
+    step = _block_rows(len(data), block_size)
+    for first in range(0, len(axes), step):
+        angles = np.arccos(
+            np.clip(np.abs(np.dot(axes[first : first + step], data.T)), 0, 1)
+        )
+        counts[first : first + step] = np.sum(
+            np.abs(angles - alphas[first : first + step, None]) <= threshold,
+            axis=1,
+        )
+    best, best_inliers = None, None
+    for index in np.argsort(counts)[::-1][:n_refine]:
+        cone = axes[index], alphas[index], 0.0, 0.0
+        inliers = _cone_inliers(data, *cone, threshold=threshold)
+        # refit until the inliers settle
+        for _ in range(10):
+            if inliers.sum() < 5:
+                break
+            cone = fit_cone(
+                data[inliers],
+                None if weights is None else weights[inliers],
+                elliptical,
+                cone[0],
+            )
+            previous = inliers
+            inliers = _cone_inliers(data, *cone, threshold=threshold)
+            if np.array_equal(inliers, previous):
+                break
+        if best is None or inliers.sum() > best_inliers.sum():
+            best, best_inliers = cone, inliers
+    if best is None:
+        raise ValueError(
+            "no random triple of vectors defines a cone, the data may be "
+            "identical or collinear"
+        )
+    axis, alpha, A, B = best
+    if start is not None:
+        _stage_end(
+            "fit_cone_ransac", start, vectors=len(data), hypotheses=len(axes)
+        )
+    return Vector(axis), alpha, A, B, best_inliers
+
+
 class Vector(np.ndarray):
     def __new__(cls, dcos_data):
         return np.asarray(dcos_data).view(cls)
@@ -96,7 +1026,7 @@ class Vector(np.ndarray):
             other_length = sqrt(other.dot(other))
             return acos(np.clip(self.dot(other) / (self_length * other_length), -1, 1))
         else:
-            return atan2(self.cross_with(other), self.dot(other))
+            return atan2(self.cross_with(other).length, self.dot(other))
 
     def cross_with(self, other):
         return Vector(np.cross(self, other))
@@ -104,37 +1034,37 @@ class Vector(np.ndarray):
     def normalized_cross_with(self, other):
         return Vector(normalized_cross(self, other))
 
-    @property
+    @_cached_property
     def attitude(self):
         x, y, z = self / self.length
         if z > 0:
             x, y = -x, -y
         return degrees(atan2(x, y)) % 360, degrees(asin(abs(z)))
 
-    @property  # this should be cached
+    @_cached_property
     def length(self):
         return sqrt(self.dot(self))
 
-    @property
+    @_cached_property
     def direction_vector(self):
         if abs(self[2]) == 1.0:
             return Vector((1.0, 0.0, 0.0))
         direction = Vector((self[1], -self[0], 0.0))
         return direction / direction.length
 
-    @property
+    @_cached_property
     def dip_vector(self):
         return Vector(np.cross(self / self.length, self.direction_vector))
 
-    @property
+    @_cached_property
     def projection_matrix(self):
         return np.outer(self, self)
 
-    @property
+    @_cached_property
     def rejection_matrix(self):
         return np.eye(3) - self.projection_matrix
 
-    @property
+    @_cached_property
     def cross_product_matrix(self):
         return np.array(
             (
@@ -151,7 +1081,15 @@ class Vector(np.ndarray):
             + (1 - cos(theta)) * self.projection_matrix
         )
 
-    def get_great_circle(self, step=radians(1.0), offset=0.0):
+    def get_great_circle(
+        self, step=radians(1.0), offset=0.0, tolerance=None, projection=None
+    ):
+        if tolerance is not None:
+            return tuple(
+                VectorSet(self).great_circles(
+                    step, offset, tolerance, projection
+                )
+            )
         theta_range = np.arange(offset, 2 * pi + offset, step) % (2 * pi)
         sin_range = np.sin(theta_range)
         cos_range = np.cos(theta_range)
@@ -162,7 +1100,22 @@ class Vector(np.ndarray):
             ).T,
         )
 
-    def get_small_circle(self, alpha, A=0, B=0, step=radians(1.0), offset=0.0):
+    def get_small_circle(
+        self,
+        alpha,
+        A=0,
+        B=0,
+        step=radians(1.0),
+        offset=0.0,
+        tolerance=None,
+        projection=None,
+    ):
+        if tolerance is not None:
+            return tuple(
+                VectorSet(self).small_circles(
+                    alpha, A, B, step, offset, tolerance, projection
+                )
+            )
         if A == 0 and B == 0:
             sc = self.get_great_circle(step, offset)[0].T * sin(alpha) + self[
                 :, None
@@ -179,9 +1132,24 @@ class Vector(np.ndarray):
             ] * np.cos(alpha_)
         return sc.T, -sc.T
 
-    def arc_to(self, other, step=radians(1.0)):
+    def arc_to(
+        self, other, step=radians(1.0), tolerance=None, projection=None
+    ):
         normal = self.rejection_matrix.dot(other)
         normal /= sqrt(normal.dot(normal))
+        if tolerance is not None:
+            return tuple(
+                _adaptive_sample(
+                    _trigonometric_curve(
+                        np.zeros((1, 3)), np.array([self]), normal[None]
+                    ),
+                    1,
+                    0.0,
+                    self.angle_with(other),
+                    tolerance,
+                    projection,
+                )
+            )
         theta_range = np.arange(0, self.angle_with(other), step)
         sin_range = np.sin(theta_range)
         cos_range = np.cos(theta_range)
@@ -196,26 +1164,49 @@ class VectorSet(np.ndarray):
     """Class that represents a set (collection) of Vectors.
 
     Parameters:
-        dcos_data: Is an array of direction cosines.
+        dcos_data: Is an array of direction cosines. A np.memmap is used
+        without copying, see from_file.
     """
 
     item_class = Vector
+    index = None
 
     def __new__(cls, dcos_data):
         obj = np.asarray(dcos_data).view(cls)
         return obj
 
-    def __finalize_array__(self, obj):
+    def __array_finalize__(self, obj):
         if obj is None:
             return
+        item_class = getattr(obj, "item_class", None)
+        if item_class is not None and item_class is not self.item_class:
+            self.item_class = item_class
 
     def __getitem__(self, x):
-        item = super(VectorSet, self).__getitem__(x)
-        if np.atleast_2d(item).shape == (1, 3):
+        item = np.ndarray.__getitem__(self, x)
+        if getattr(item, "shape", None) in ((3,), (1, 3)):
             return item.view(self.item_class)
         else:
             return item
 
+    def __iter__(self):
+        if self.ndim != 2:
+            return np.ndarray.__iter__(self)
+        item_class = self.item_class
+        return (row.view(item_class) for row in self.view(np.ndarray))
+
+    def build_index(self, axial=True, cell_size=None):
+        """Builds a SphericalIndex of this VectorSet for neighbourhood
+        queries, and attaches it as the index attribute, which is used by
+        count_kamb. The index must be rebuilt if the data changes.
+
+        Parameters:
+            axial: Whether v and -v represent the same direction.
+            cell_size: See SphericalIndex.
+        """
+        self.index = SphericalIndex(self, axial, cell_size)
+        return self.index
+
     # @property
     # def stats(self):
     #     """Contains spherical statistics object for the data
@@ -223,83 +1214,592 @@ class VectorSet(np.ndarray):
     #     """
     #     return SphericalStatistics(self)
 
+    @staticmethod
+    def from_file(fname, mode="r"):
+        """Returns a VectorSet backed by a memory-mapped file of direction
+        cosines, for datasets that don't fit in memory.
+
+        Parameters:
+            fname: Either a .npy file, such as the caches written by
+            load_attitudes, or a raw file of float64 (x, y, z) rows.
+            mode: File mode, as in np.memmap. Defaults to read only.
+        """
+        if fname.endswith(".npy"):
+            return VectorSet(np.load(fname, mmap_mode=mode))
+        data = np.memmap(fname, dtype=float, mode=mode)
+        return VectorSet(data.reshape(-1, 3))
+
+    def blocks(self, block_size=None):
+        """Returns a generator of consecutive VectorSet views of this
+        VectorSet with block_size rows each. If None, blocks of about
+        BLOCK_ELEMENTS values are used."""
+        data = np.reshape(self, (-1, 3))
+        step = _block_rows(3, block_size)
+        for start in range(0, len(data), step):
+            yield data[start : start + step]
+
     @property
     def attitude(self):
         """Converts this data from direction cosines to attitudes."""
-        return sphere_line(self)
-
-    # def count_fisher(self, k=None, grid=None):
-    #     """Performs grid counting of the data by Fisher smoothing.
-
-    #     Parameters:
-    #         k: von Mises-Fisher k parameter, see 
-    #         stats.SphericalGrid.count_fisher.
-            
-    #         grid: A stats.Spherical grid object to count on. If None
-    #         the default grid defined on stats.DEFAULT_GRID will be
-    #         used.
-    #     """
-    #     if grid is None:
-    #         grid = DEFAULT_GRID
-    #     return grid.count_fisher(self, k)
-
-    # def count_kamb(self, theta=None, grid=None):
-    #     """Performs grid counting of the data by small circles of
-    #     aperture theta.
-
-    #     Parameters:
-    #         theta: Robin and Jowett (1986) based on Kamb (1956) theta
-    #         parameter, see stats.SphericalGrid.count_kamb.
-            
-    #         grid: A stats.Spherical grid object to count on. If None
-    #         the default grid defined on stats.DEFAULT_GRID will be
-    #         used.
-    #     """
-    #     if grid is None:
-    #         grid = DEFAULT_GRID
-    #     return grid.count_kamb(self, theta)
+        data = np.reshape(self, (-1, 3))
+        attitudes = np.empty((len(data), 2))
+        start = 0
+        for block in self.blocks():
+            attitudes[start : start + len(block)] = sphere_line(block)
+            start += len(block)
+        if self.ndim == 1:
+            return attitudes[0]
+        return attitudes.reshape(self.shape[:-1] + (2,))
+
+    def count_fisher(self, k=None, grid=None, block_size=None):
+        """Performs grid counting of the data by Fisher smoothing.
 
-    def normalized_cross_with(self, other):
+        Parameters:
+            k: von Mises-Fisher k parameter, see
+            SphericalGrid.count_fisher.
+
+            grid: A SphericalGrid object to count on. If None the default
+            grid from SphericalGrid.default() will be used.
+
+            block_size: Number of data rows counted at a time, see
+            SphericalGrid.count_fisher.
+        """
+        if grid is None:
+            grid = SphericalGrid.default()
+        return grid.count_fisher(self, k, block_size)
+
+    def count_kamb(self, theta=None, grid=None, block_size=None):
+        """Performs grid counting of the data by small circles of
+        aperture theta.
+
+        Parameters:
+            theta: Robin and Jowett (1986) based on Kamb (1956) theta
+            parameter, see SphericalGrid.count_kamb.
+
+            grid: A SphericalGrid object to count on. If None the default
+            grid from SphericalGrid.default() will be used.
+
+            block_size: Number of data rows counted at a time, see
+            SphericalGrid.count_kamb. Not used if an axial index was built
+            with build_index, in which case it is used for the counting.
+        """
+        if grid is None:
+            grid = SphericalGrid.default()
+        return grid.count_kamb(self, theta, block_size)
+
+    def normalized_cross_with(self, other=None, unique=False, block_size=None):
         """Returns a VectorSet object containing the normalized cross
         product of all possible pairs between this VectorSet and an
-        (n, 3) array-like
+        (n, 3) array-like, flipped to the lower hemisphere. Degenerate
+        (parallel) pairs result in null vectors.
 
         Parameter:
-            other: A VectorSet like object.
+            other: A VectorSet like object. If None, this VectorSet is
+            crossed with itself.
+            unique: Only compute the pairs (i, j) with i < j, for when a
+            set is crossed with itself.
+            block_size: Number of rows of this VectorSet processed at a
+            time, see normalized_cross_blocks.
         """
-        vectors = np.zeros((len(self) * len(other), 3))
+        n = len(np.reshape(self, (-1, 3)))
+        m = n if other is None else len(np.reshape(other, (-1, 3)))
+        if unique:
+            size = np.clip(m - 1 - np.arange(n), 0, None).sum()
+        else:
+            size = n * m
+        vectors = np.empty((size, 3))
         i = 0
-        for self_vector in self:
-            for other_vector in other:
-                cross = normalized_cross(self_vector, other_vector)
-                vectors[i] = cross if cross[2] < 0 else -cross
-                i += 1
+        for block in self.normalized_cross_blocks(other, unique, block_size):
+            vectors[i : i + len(block)] = block
+            i += len(block)
         return VectorSet(vectors)
 
-    def angle_with(self, other, precise=False):
+    def normalized_cross_blocks(
+        self, other=None, unique=False, block_size=None
+    ):
+        """Returns a generator of VectorSet blocks with the results of
+        normalized_cross_with, in the same order, for when all pairs
+        don't fit in memory.
+
+        Parameter:
+            other: A VectorSet like object. If None, this VectorSet is
+            crossed with itself.
+            unique: Only compute the pairs (i, j) with i < j, for when a
+            set is crossed with itself.
+            block_size: Number of rows of this VectorSet processed at a
+            time. If None, it is chosen so that each block holds about
+            BLOCK_ELEMENTS values.
+        """
+        data = np.reshape(self, (-1, 3))
+        if other is None:
+            other = data
+        else:
+            other = np.reshape(np.asarray(other, dtype=float), (-1, 3))
+        step = _block_rows(3 * len(other), block_size)
+        for start in range(0, len(data), step):
+            block = data[start : start + step]
+            if unique:
+                columns = other[start + 1 :]
+                cross = np.cross(block[:, None, :], columns[None, :, :])
+                cross = cross[
+                    np.arange(len(columns)) >= np.arange(len(block))[:, None]
+                ]
+            else:
+                cross = np.cross(block[:, None, :], other[None, :, :])
+                cross = cross.reshape(-1, 3)
+            length = np.sqrt(np.einsum("ij,ij->i", cross, cross))[:, None]
+            np.divide(cross, length, out=cross, where=length > 0)
+            cross[cross[:, 2] >= 0] *= -1
+            yield VectorSet(cross)
+
+    def angle_with(self, other, precise=False, out=None, block_size=None):
         """Returns the angles matrix between this Spherical Data and an
         (n, 3) array-like.
 
         Parameter:
             other: A VectorSet like object.
             precise: whether to use arccosine or arctangent (defaults False)
+            out: Optional (len(self), n) array, possibly a np.memmap, to
+            write the angles into. If a file name is given, a memory-mapped
+            .npy file is created for the output.
+            block_size: Number of rows of this VectorSet processed at a
+            time. If None, it is chosen so that temporaries hold about
+            BLOCK_ELEMENTS values.
         """
-        angles = np.zeros((len(self), len(other)))
-        for i, self_vector in enumerate(self):
-            for j, other_vector in enumerate(other):
-                angles[i, j] = self_vector.angle_with(other_vector, precise)
-        return angles
+        data = np.reshape(self, (-1, 3))
+        other = np.reshape(np.asarray(other, dtype=float), (-1, 3))
+        shape = (len(data), len(other))
+        if out is None:
+            out = np.empty(shape)
+        elif isinstance(out, str):
+            out = np.lib.format.open_memmap(
+                out, mode="w+", dtype=float, shape=shape
+            )
+        elif out.shape != shape:
+            raise ValueError(
+                "out has shape {}, expected {}".format(out.shape, shape)
+            )
+        other_length = np.sqrt(np.einsum("ij,ij->i", other, other))
+        step = _block_rows(len(other) * (3 if precise else 1), block_size)
+        for start in range(0, len(data), step):
+            block = data[start : start + step]
+            dots = np.dot(block, other.T)
+            if precise:
+                cross = np.cross(block[:, None, :], other[None, :, :])
+                cross_length = np.sqrt(np.einsum("ijk,ijk->ij", cross, cross))
+                np.arctan2(cross_length, dots, out=out[start : start + step])
+            else:
+                block_length = np.sqrt(np.einsum("ij,ij->i", block, block))
+                dots /= block_length[:, None]
+                dots /= other_length
+                np.clip(dots, -1, 1, out=dots)
+                np.arccos(dots, out=out[start : start + step])
+        return out
+
+    def rotate(self, axes, angles, block_size=None):
+        """Returns this VectorSet rotated by angles, in radians, about
+        axes, either one for all vectors or one for each, see rotate."""
+        return rotate(self, axes, angles, block_size)
+
+    @property
+    def direction_vector(self):
+        """Horizontal vectors perpendicular to each vector, see
+        Vector.direction_vector."""
+        data = np.reshape(self, (-1, 3))
+        direction = np.zeros_like(data, dtype=float)
+        direction[:, 0] = data[:, 1]
+        direction[:, 1] = -data[:, 0]
+        length = np.sqrt(np.einsum("ij,ij->i", direction, direction))
+        vertical = np.abs(data[:, 2]) == 1.0
+        direction[vertical] = (1.0, 0.0, 0.0)
+        length[vertical] = 1.0
+        return VectorSet(direction / length[:, None])
+
+    @property
+    def dip_vector(self):
+        """Vectors of maximum dip in the planes normal to each vector, see
+        Vector.dip_vector."""
+        data = np.reshape(self, (-1, 3))
+        data = data / np.sqrt(np.einsum("ij,ij->i", data, data))[:, None]
+        return VectorSet(np.cross(data, self.direction_vector))
+
+    def great_circles(
+        self, step=radians(1.0), offset=0.0, tolerance=None, projection=None
+    ):
+        """Returns the great circles normal to all vectors of this
+        VectorSet as a (k, n, 3) array, which can be passed directly to
+        ProjectionPlot.as_lines.
+
+        Parameters:
+            step: Angular step in radians to generate points around great
+            circles.
+            offset: Angle in radians of the first point of the circles.
+            tolerance: If given, step is ignored and the circles are
+            sampled adaptively, so that the distance between them and
+            their chords stays below tolerance, and returned as a list
+            of arrays. See ProjectionPlot.pixel_tolerance.
+            projection: ProjectionBase object on which the chord error is
+            measured. If None, it is measured on the sphere.
+        """
+        if tolerance is not None:
+            direction = np.asarray(self.direction_vector)
+            return _adaptive_sample(
+                _trigonometric_curve(
+                    np.zeros_like(direction),
+                    direction,
+                    np.asarray(self.dip_vector),
+                ),
+                len(direction),
+                offset,
+                offset + 2 * pi,
+                tolerance,
+                projection,
+            )
+        theta_range = np.arange(offset, 2 * pi + offset, step) % (2 * pi)
+        return (
+            self.direction_vector[:, None, :] * np.cos(theta_range)[:, None]
+            + self.dip_vector[:, None, :] * np.sin(theta_range)[:, None]
+        ).view(np.ndarray)
+
+    def small_circles(
+        self,
+        alpha,
+        A=0,
+        B=0,
+        step=radians(1.0),
+        offset=0.0,
+        tolerance=None,
+        projection=None,
+    ):
+        """Returns the small circles around all vectors of this VectorSet,
+        see Vector.get_small_circle, as a (2k, n, 3) array with the k
+        circles followed by their k opposites, which can be passed
+        directly to ProjectionPlot.as_lines.
+
+        Parameters:
+            alpha: Aperture of the circles in radians, either a single
+            value or one per vector.
+            A, B: Ellipticity terms, added to alpha as A cos(2 theta) +
+            B sin(2 theta) around the circles, either single values or
+            one per vector.
+            step: Angular step in radians to generate points around the
+            circles.
+            offset: Angle in radians of the first point of the circles.
+            tolerance, projection: Adaptive sampling of the circles, see
+            great_circles.
+        """
+        if tolerance is not None:
+            return self._adaptive_small_circles(
+                alpha, A, B, offset, tolerance, projection
+            )
+        theta_range = np.arange(offset, 2 * pi + offset, step) % (2 * pi)
+        alpha = np.reshape(alpha, (-1, 1))
+        if np.any(A) or np.any(B):
+            alpha = (
+                alpha
+                + np.reshape(A, (-1, 1)) * np.cos(2 * theta_range)
+                + np.reshape(B, (-1, 1)) * np.sin(2 * theta_range)
+            )
+        great_circles = self.great_circles(step, offset)
+        circles = (
+            great_circles * np.sin(alpha)[..., None]
+            + np.reshape(self, (-1, 1, 3)) * np.cos(alpha)[..., None]
+        ).view(np.ndarray)
+        return np.concatenate((circles, -circles))
+
+    def _adaptive_small_circles(
+        self, alpha, A, B, offset, tolerance, projection
+    ):
+        axes = np.reshape(self, (-1, 3)).view(np.ndarray)
+        k = len(axes)
+        direction = np.asarray(self.direction_vector)
+        dip = np.asarray(self.dip_vector)
+        alpha, A, B = (
+            np.broadcast_to(np.ravel(value), (k,)) for value in (alpha, A, B)
+        )
+
+        def circle(index, theta):
+            # the circles are followed by their opposites
+            sign = np.where(index < k, 1.0, -1.0)[:, None]
+            index = index % k
+            aperture = (
+                alpha[index]
+                + A[index] * np.cos(2 * theta)
+                + B[index] * np.sin(2 * theta)
+            )
+            return sign * (
+                (
+                    direction[index] * np.cos(theta)[:, None]
+                    + dip[index] * np.sin(theta)[:, None]
+                )
+                * np.sin(aperture)[:, None]
+                + axes[index] * np.cos(aperture)[:, None]
+            )
+
+        return _adaptive_sample(
+            circle, 2 * k, offset, offset + 2 * pi, tolerance, projection
+        )
 
     def get_great_circle(self, step=radians(1.0)):
-        """Returns a generator to the list of great circles of 
+        """Returns a generator to the list of great circles of
         this VectorSet vectors.
 
         Parameters:
-            step: Angular step in radians to generate points around great 
+            step: Angular step in radians to generate points around great
             circle.
         """
-        for vector in self:
-            yield vector.get_great_circle(step)[0]  # because of plot_circles
+        for circle in self.great_circles(step):
+            yield circle  # because of plot_circles
+
+
+class SphericalGrid(object):
+    """Grid of nearly evenly spaced counting nodes covering the lower
+    hemisphere, for density counting of axial data.
+
+    Parameters:
+        node_spacing: Approximate angle between neighbouring nodes, in
+        degrees.
+    """
+
+    _default = None
+
+    def __init__(self, node_spacing=2.5):
+        self.node_spacing = node_spacing
+        spacing = radians(node_spacing)
+        nodes = [(0.0, 90.0)]
+        n_rings = max(1, int(round(90.0 / node_spacing)))
+        for plunge in np.linspace(90.0, 0.0, n_rings + 1)[1:]:
+            ring_length = 2 * pi * cos(radians(plunge))
+            n_nodes = max(1, int(round(ring_length / spacing)))
+            trends = np.arange(n_nodes) * 360.0 / n_nodes
+            nodes.extend((trend, plunge) for trend in trends)
+        self.nodes = VectorSet(dcos_line(np.array(nodes)))
+
+    @classmethod
+    def default(cls):
+        """Returns the default counting grid, which is built on first use
+        and reused afterwards."""
+        if SphericalGrid._default is None:
+            SphericalGrid._default = SphericalGrid()
+        return SphericalGrid._default
+
+    def _count(self, data, kernel, block_size):
+        data = np.reshape(data, (-1, 3))
+        nodes = np.asarray(self.nodes)
+        counts = np.zeros(len(nodes))
+        step = _block_rows(len(nodes), block_size)
+        for start in range(0, len(data), step):
+            cosines = np.abs(np.dot(data[start : start + step], nodes.T))
+            counts += kernel(cosines).sum(axis=0)
+        return counts
+
+    def count_fisher(self, data, k=None, block_size=None):
+        """Counts the data on the grid nodes by Fisher smoothing, summing
+        exp(k(|cos(angle)| - 1)) over all data points.
+
+        Parameters:
+            data: An (n, 3) array-like of direction cosines.
+
+            k: von Mises-Fisher k parameter. If None, 2(1 + n/9) is used,
+            following Robin and Jowett (1986).
+
+            block_size: Number of data rows counted at a time. If None, it
+            is chosen so that temporaries hold about BLOCK_ELEMENTS values.
+        """
+        if k is None:
+            k = 2.0 * (1.0 + len(np.reshape(data, (-1, 3))) / 9.0)
+        return self._count(
+            data, lambda cosines: np.exp(k * (cosines - 1.0)), block_size
+        )
+
+    def count_kamb(self, data, theta=None, block_size=None):
+        """Counts the data points inside small circles of aperture theta
+        around each grid node.
+
+        Parameters:
+            data: An (n, 3) array-like of direction cosines.
+
+            theta: Aperture of the counting circles, in degrees. If None,
+            the circle holding 3 standard deviations of the expected
+            count of uniform data is used, after Robin and Jowett (1986)
+            based on Kamb (1956), so that cos(theta) = n/(n + 9).
+
+            block_size: Number of data rows counted at a time. If None, it
+            is chosen so that temporaries hold about BLOCK_ELEMENTS values.
+        """
+        if theta is None:
+            n = len(np.reshape(data, (-1, 3)))
+            cos_theta = n / (n + 9.0)
+        else:
+            cos_theta = cos(radians(theta))
+        index = getattr(data, "index", None)
+        if index is not None and index.axial:
+            counts = index.count_within(self.nodes, acos(cos_theta))
+            return counts.astype(float)
+        return self._count(
+            data, lambda cosines: cosines >= cos_theta, block_size
+        )
+
+
+class SphericalIndex(object):
+    """Spatial index for neighbourhood queries on the sphere. The
+    direction cosines are binned on a regular grid of cubic cells, so
+    that queries only check the points of nearby cells.
+
+    Parameters:
+        data: An (n, 3) array-like of direction cosines.
+        axial: Whether v and -v represent the same direction, as for
+        poles and lineations. Defaults True.
+        cell_size: Side of the cells, in direction cosine units. If None
+        it is chosen to hold about 8 points per cell.
+    """
+
+    def __init__(self, data, axial=True, cell_size=None):
+        data = np.reshape(np.asarray(data, dtype=float), (-1, 3))
+        data = data / np.sqrt(np.einsum("ij,ij->i", data, data))[:, None]
+        if axial:
+            data = np.where(data[:, 2:] > 0, -data, data)
+        if cell_size is None:
+            area = 2 * pi if axial else 4 * pi
+            cell_size = sqrt(8.0 * area / max(len(data), 1))
+        self.data = data
+        self.axial = axial
+        self.cell_size = min(cell_size, 2.0)
+        self.n_cells = int(ceil(2.0 / self.cell_size))
+        keys = self._keys(self._cells(data))
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+
+    def __len__(self):
+        return len(self.data)
+
+    def _cells(self, points):
+        cells = np.floor((np.asarray(points) + 1.0) / self.cell_size)
+        return np.clip(cells.astype(int), 0, self.n_cells - 1)
+
+    def _keys(self, cells):
+        i, j, k = np.moveaxis(cells, -1, 0)
+        return (i * self.n_cells + j) * self.n_cells + k
+
+    def _candidates(self, point, chord):
+        low, high = self._cells((point - chord, point + chord))
+        size = np.prod(high - low + 1)
+        if size > len(self.data):
+            return np.arange(len(self.data))
+        ranges = [np.arange(l, h + 1) for l, h in zip(low, high)]
+        cells = np.stack(np.meshgrid(*ranges, indexing="ij"), axis=-1)
+        keys = self._keys(cells).ravel()
+        start = np.searchsorted(self.keys, keys, "left")
+        stop = np.searchsorted(self.keys, keys, "right")
+        lengths = stop - start
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(start - offsets, lengths)
+        positions += np.arange(len(positions))
+        return self.order[positions]
+
+    def _cosines(self, point, candidates):
+        cosines = np.dot(self.data[candidates], point)
+        return np.abs(cosines) if self.axial else cosines
+
+    def query_angle(self, point, theta):
+        """Returns the sorted indices of the points within an angle
+        theta, in radians, of point."""
+        point = np.asarray(point, dtype=float)
+        point = point / sqrt(point.dot(point))
+        chord = 2.0 * sin(min(theta, pi) / 2.0)
+        candidates = self._candidates(point, chord)
+        if self.axial:
+            candidates = np.union1d(
+                candidates, self._candidates(-point, chord)
+            )
+        else:
+            candidates = np.sort(candidates)
+        return candidates[self._cosines(point, candidates) >= cos(theta)]
+
+    def query_nearest(self, point, k=1):
+        """Returns the indices of the k points nearest to point and their
+        angles to it, in radians, sorted by angle."""
+        k = min(k, len(self.data))
+        point = np.asarray(point, dtype=float)
+        point = point / sqrt(point.dot(point))
+        # start from the cap expected to hold k points for uniform data
+        fraction = float(k) / max(len(self.data), 1)
+        theta = acos(max(-1.0, 1.0 - (1.0 if self.axial else 2.0) * fraction))
+        while True:
+            candidates = self.query_angle(point, theta)
+            if len(candidates) >= k or theta >= pi:
+                break
+            theta = min(2.0 * theta, pi)
+        cosines = np.clip(self._cosines(point, candidates), -1.0, 1.0)
+        angles = np.arccos(cosines)
+        nearest = np.argsort(angles, kind="stable")[:k]
+        return candidates[nearest], angles[nearest]
+
+    def count_within(self, points, theta, block_size=None):
+        """Returns the number of indexed points within an angle theta, in
+        radians, of each of an (m, 3) array-like of points.
+
+        The candidate cells around all points are looked up at once, in
+        blocks of about BLOCK_ELEMENTS candidates, or of block_size
+        points if given, and the points within theta are counted with
+        bincount. If axial, the cells around each point and its opposite
+        are checked separately, as their caps don't overlap for theta
+        below pi/2.
+        """
+        points = np.reshape(np.asarray(points, dtype=float), (-1, 3))
+        norms = np.sqrt(np.einsum("ij,ij->i", points, points))
+        points = points / norms[:, None]
+        m, cos_theta = len(points), cos(theta)
+        if self.axial and cos_theta <= 0.0:
+            return np.full(m, len(self.data))
+        centers, owners = points, np.arange(m)
+        if self.axial:
+            centers = np.vstack((points, -points))
+            owners = np.concatenate((owners, owners))
+        chord = 2.0 * sin(min(theta, pi) / 2.0)
+        low, high = self._cells(centers - chord), self._cells(centers + chord)
+        width = (high - low).max(axis=0) + 1 if m else np.ones(3, int)
+        counts = np.zeros(m, dtype=int)
+        if np.prod(width) > len(self.data):
+            step = _block_rows(len(self.data), block_size)
+            for first in range(0, len(centers), step):
+                cosines = np.dot(centers[first : first + step], self.data.T)
+                counts += np.bincount(
+                    owners[first : first + step],
+                    (cosines >= cos_theta).sum(axis=1),
+                    minlength=m,
+                ).astype(int)
+            return counts
+        ranges = [np.arange(w) for w in width]
+        offsets = np.stack(np.meshgrid(*ranges, indexing="ij"), axis=-1)
+        offsets = offsets.reshape(-1, 3)
+        step = _block_rows(len(offsets), block_size)
+        for first in range(0, len(centers), step):
+            cells = low[first : first + step, None] + offsets
+            inside = (cells <= high[first : first + step, None]).all(axis=-1)
+            keys = self._keys(cells)
+            start = np.searchsorted(self.keys, keys, "left")
+            lengths = np.searchsorted(self.keys, keys, "right") - start
+            lengths[~inside] = 0
+            # split the candidates of the block in groups of centers
+            totals = np.cumsum(lengths.sum(axis=1))
+            groups = np.flatnonzero(np.diff(totals // BLOCK_ELEMENTS)) + 1
+            for group in np.split(np.arange(len(cells)), groups):
+                group_lengths = lengths[group].ravel()
+                group_offsets = np.cumsum(group_lengths) - group_lengths
+                positions = np.repeat(
+                    start[group].ravel() - group_offsets, group_lengths
+                )
+                positions += np.arange(len(positions))
+                candidates = self.order[positions]
+                center = np.repeat(first + group, lengths[group].sum(axis=1))
+                cosines = np.einsum(
+                    "ij,ij->i", self.data[candidates], centers[center]
+                )
+                counts += np.bincount(
+                    owners[center[cosines >= cos_theta]], minlength=m
+                )
+        return counts
 
 
 class ProjectionBase(object):
@@ -343,10 +1843,93 @@ class ProjectionBase(object):
             return np.transpose(data)
 
     def direct(self, data, invert_positive=True, rotate=True):
-        return self._dtr(*self._pre_direct(data, invert_positive, rotate))
+        stage = _stage_start()
+        step = _block_rows(8)
+        if np.ndim(data) != 2 or len(data) <= step:
+            X, Y = self._dtr(*self._pre_direct(data, invert_positive, rotate))
+        else:
+            # large, possibly memory-mapped, data is projected in blocks so
+            # the temporaries stay bounded
+            X, Y = np.empty(len(data)), np.empty(len(data))
+            for start in range(0, len(data), step):
+                X[start : start + step], Y[start : start + step] = self._dtr(
+                    *self._pre_direct(
+                        data[start : start + step], invert_positive, rotate
+                    )
+                )
+        if stage is not None:
+            _stage_end(
+                "direct",
+                stage,
+                vectors=np.size(X),
+                bytes=np.asarray(X).nbytes + np.asarray(Y).nbytes,
+            )
+        return X, Y
 
     def inverse(self, data, rotate=True):
-        return self._post_inverse(self._itr(*np.transpose(data)), rotate)
+        stage = _stage_start()
+        inverted = self._post_inverse(self._itr(*np.transpose(data)), rotate)
+        if stage is not None:
+            _stage_end(
+                "inverse",
+                stage,
+                vectors=np.size(inverted) // 3,
+                bytes=np.asarray(inverted).nbytes,
+            )
+        return inverted
+
+    def direct_batch(
+        self, data, rotations, invert_positive=True, out=None, block_size=None
+    ):
+        """Projects data under each of a stack of rotation matrices, in a
+        single pass fusing the rotation, normalization and hemisphere
+        inversion. The rotation given at construction is not used.
+
+        Parameters:
+            data: A (..., 3) array-like of vectors. Several datasets of the
+            same size may be stacked, or concatenated beforehand.
+            rotations: A (r, 3, 3) array-like of rotation matrices, such as
+            the ones from build_rotation_matrix.
+            invert_positive: Whether to project vectors pointing upwards
+            to their opposites, as in direct.
+            out: Optional C-contiguous (r, ..., 2) array for the projected
+            X, Y coordinates.
+            block_size: Number of vectors projected at a time. If None,
+            it is chosen so that temporaries hold about BLOCK_ELEMENTS
+            values.
+
+        Returns the (r, ..., 2) array of projected coordinates.
+        """
+        stage = _stage_start()
+        data = np.asarray(data, dtype=float)
+        rotations = np.reshape(rotations, (-1, 3, 3))
+        shape = (len(rotations),) + data.shape[:-1] + (2,)
+        if out is None:
+            out = np.empty(shape)
+        elif out.shape != shape or not out.flags.c_contiguous:
+            raise ValueError(
+                "out must be a C-contiguous array of shape {}".format(shape)
+            )
+        data = data.reshape(-1, 3)
+        projected = out.reshape(len(rotations), -1, 2)
+        step = _block_rows(8 * len(rotations), block_size)
+        for start in range(0, len(data), step):
+            rotated = np.matmul(rotations, data[start : start + step].T)
+            x, y, z = rotated[:, 0], rotated[:, 1], rotated[:, 2]
+            d = 1.0 / np.sqrt(x * x + y * y + z * z)
+            if invert_positive:
+                d[z > 0] *= -1
+            X, Y = self._dtr(d * x, d * y, d * z)
+            projected[:, start : start + step, 0] = X
+            projected[:, start : start + step, 1] = Y
+        if stage is not None:
+            _stage_end(
+                "direct_batch",
+                stage,
+                vectors=len(data) * len(rotations),
+                bytes=out.nbytes,
+            )
+        return out
 
 
 class EqualAngle(ProjectionBase):
@@ -403,7 +1986,70 @@ class EqualArea(ProjectionBase):
         return x, y, z
 
 
+class LRUCache(object):
+    """Bounded least recently used cache.
+
+    Parameters:
+        maxsize: Maximum number of entries kept.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Returns the value cached for key, or None."""
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class NetCache(LRUCache):
+    """Bounded least recently used cache of projected reference nets,
+    keyed by projection type, rotation and net parameters, see
+    ProjectionPlot.net_lines.
+
+    Parameters:
+        maxsize: Maximum number of nets kept.
+    """
+
+    def save(self, fname):
+        """Saves the cached nets to a file, to be loaded by load."""
+        with open(fname, "wb") as f:
+            pickle.dump(
+                list(self._entries.items()), f, pickle.HIGHEST_PROTOCOL
+            )
+
+    def load(self, fname):
+        """Adds the nets saved to a file by save to this cache. Only load
+        files you trust, as they are unpickled."""
+        with open(fname, "rb") as f:
+            for key, net in pickle.load(f):
+                for line in net[0] + net[1]:
+                    line.flags.writeable = False
+                self.put(key, net)
+
+
 class ProjectionPlot(object):
+    net_cache = NetCache()
+    contour_cache = LRUCache(maxsize=8)
+
     point_defaults = {"marker": "o", "c": "#000000", "ms": 3.0}
 
     line_defaults = {"linewidths": 0.8, "colors": "#4D4D4D", "linestyles": "-"}
@@ -436,50 +2082,95 @@ class ProjectionPlot(object):
         "horizontalalignment": "center",
     }
 
+    @staticmethod
+    def _clip_segments(data, z_tol=0.1):
+        """find the runs of points inside the primitive of a (n, 3) circle
+        or a stacked (k, n, 3) batch of circles. Returns arrays with the
+        circle index, start and stop of each run."""
+        stage = _stage_start()
+        inside = np.asarray(data)[..., 2] < z_tol
+        inside = inside.reshape(-1, inside.shape[-1])
+        edges = np.zeros((inside.shape[0], inside.shape[1] + 1), np.int8)
+        edges[:, 1:] = inside
+        edges[:, :-1] -= inside
+        circle, start = np.nonzero(edges == -1)
+        stop = np.nonzero(edges == 1)[1]
+        if stage is not None:
+            _stage_end(
+                "clip", stage, vertices=inside.size, segments=len(circle)
+            )
+        return circle, start, stop
+
     @staticmethod
     def _clip_lines(data, z_tol=0.1):
         """segment point pairs between inside and outside of primitive, for
-        avoiding spurious lines when plotting circles."""
-        z = np.transpose(data)[2]
-        inside = z < z_tol
-        results = []
-        current = []
-        for i, is_inside in enumerate(inside):
-            if is_inside:
-                current.append(data[i])
-            elif current:
-                results.append(current)
-                current = []
-        if current:
-            results.append(current)
-        return results
+        avoiding spurious lines when plotting circles. Returns views of
+        data, which may be a (n, 3) circle or a (k, n, 3) batch of them."""
+        circle, start, stop = ProjectionPlot._clip_segments(data, z_tol)
+        data = data.reshape(-1, data.shape[-2], data.shape[-1])
+        return [data[c, i:j] for c, i, j in zip(circle, start, stop)]
+
+    @staticmethod
+    def _join_chains(ends, c_tol=radians(1.0)):
+        """pair the endpoints closer than c_tol of n segments, given as a
+        (2n, 3) array of start and end points. Returns the joined chains
+        as lists of (segment index, forward) tuples."""
+        stage = _stage_start()
+        n = len(ends) // 2
+        lengths = np.sqrt(np.einsum("ij,ij->i", ends, ends))
+        cosines = np.dot(ends, ends.T) / np.outer(lengths, lengths)
+        angles = np.arccos(np.clip(cosines, -1.0, 1.0))
+        owner = np.arange(2 * n) // 2
+        angles[owner[:, None] == owner] = np.inf
+        # pair each endpoint with at most one other, closest pairs first.
+        # gaps of c_tol up to rounding, as the one at the start of circles
+        # sampled with a step of c_tol, are always joined.
+        first, second = np.nonzero(np.triu(angles < c_tol + 1e-9))
+        order = np.argsort(angles[first, second], kind="stable")
+        partner = np.full(2 * n, -1)
+        for a, b in zip(first[order], second[order]):
+            if partner[a] == -1 and partner[b] == -1:
+                partner[a], partner[b] = b, a
+        # walk the chains, starting from the segments with a free end, then
+        # break the remaining closed loops at their first segment
+        starts = [e for e in range(2 * n) if partner[e] == -1]
+        starts += range(0, 2 * n, 2)
+        visited = np.zeros(n, bool)
+        chains = []
+        for start in starts:
+            if visited[start // 2]:
+                continue
+            chain = []
+            end = start
+            while end != -1 and not visited[end // 2]:
+                visited[end // 2] = True
+                chain.append((end // 2, end % 2 == 0))
+                end = partner[end ^ 1]
+            chains.append(chain)
+        if stage is not None:
+            _stage_end("join", stage, segments=n, chains=len(chains))
+        return chains
 
     @staticmethod
     def _join_segments(segments, c_tol=radians(1.0)):
-        """segment point pairs between inside and outside of primitive, for
-        avoiding spurious lines when plotting circles."""
-        all_joined = False
-        while not all_joined and len(segments) > 1:
-            all_joined = True
-            segment = segments.pop(0)
-            if abs(segment[-1].angle_with(segments[0][0])) < c_tol:
-                segment.extend(segments.pop(0))
-                all_joined = False
-            elif abs(segment[0].angle_with(segments[0][-1])) < c_tol:
-                segment_b = segments.pop(0)
-                segment_b.extend(segment)
-                segment = segment_b
-                all_joined = False
-            elif abs(segment[-1].angle_with(segments[0][-1])) < c_tol:
-                segment.extend(reversed(segments.pop(0)))
-                all_joined = False
-            elif abs(segment[0].angle_with(segments[0][0])) < c_tol:
-                segment_b = segments.pop(0)
-                segment_b.extend(reversed(segment))
-                segment = segment_b
-                all_joined = False
-            segments.append(segment)
-        return segments
+        """join segments whose endpoints are closer than c_tol, such as the
+        pieces of a circle split at its start point by the clipping."""
+        segments = list(segments)
+        if len(segments) < 2:
+            return segments
+        ends = np.array([(s[0], s[-1]) for s in segments]).reshape(-1, 3)
+        return [
+            ProjectionPlot._concatenate_chain(segments, chain)
+            for chain in ProjectionPlot._join_chains(ends, c_tol)
+        ]
+
+    @staticmethod
+    def _concatenate_chain(segments, chain):
+        pieces = [
+            segments[i] if forward else segments[i][::-1]
+            for i, forward in chain
+        ]
+        return pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
 
     # @staticmethod
     # def _close_polygon(projected_polygon):
@@ -497,42 +2188,124 @@ class ProjectionPlot(object):
     #     return projected_polygon
 
     @staticmethod
-    def _net_grid(gc_spacing=10.0, sc_spacing=10.0, n=360, clean_caps=True):
-        theta = np.linspace(0.0, 2 * pi, n)
+    def _net_grid(
+        gc_spacing=10.0,
+        sc_spacing=10.0,
+        n=360,
+        clean_caps=True,
+        tolerance=None,
+        projection=None,
+    ):
+        """great and small circles of the reference net, with n points
+        each or, if tolerance is given, adaptively sampled so the chord
+        error on the given projection stays below it."""
         gc_spacing, sc_spacing = radians(gc_spacing), radians(sc_spacing)
-        if clean_caps:
-            theta_gc = np.linspace(0.0 + sc_spacing, pi - sc_spacing, n)
-        else:
-            theta_gc = np.linspace(0.0, pi, n)
         gc_range = np.arange(0.0, pi + gc_spacing, gc_spacing)
         gc_range = np.hstack((gc_range, -gc_range))
         sc_range = np.arange(0.0, pi + sc_spacing, sc_spacing)
         i, j, k = np.eye(3)
-        ik_circle = i[:, None] * np.sin(theta) + k[:, None] * np.cos(theta)
-        great_circles = [
-            (
-                np.array((cos(alpha), 0.0, -sin(alpha)))[:, None]
-                * np.sin(theta_gc)
-                + j[:, None] * np.cos(theta_gc)
-            ).T
-            for alpha in gc_range
-        ]
-        small_circles = [
-            (ik_circle * sin(alpha) + j[:, None] * cos(alpha)).T
-            for alpha in sc_range
-        ]
+        cap = sc_spacing if clean_caps else 0.0
+        gc_start = np.full(len(gc_range), cap)
+        gc_stop = np.full(len(gc_range), pi - cap)
         if clean_caps:
-            for cap in (0, pi):
-                theta_gc = np.linspace(cap - sc_spacing, cap + sc_spacing, n)
-                great_circles += [
-                    (
-                        np.array((cos(alpha), 0.0, -sin(alpha)))[:, None]
-                        * np.sin(theta_gc)
-                        + j[:, None] * np.cos(theta_gc)
-                    ).T
-                    for alpha in (0, pi / 2.0)
-                ]
-        return great_circles, small_circles
+            gc_range = np.hstack((gc_range, 0.0, pi / 2.0, 0.0, pi / 2.0))
+            gc_start = np.hstack((gc_start, [-cap, -cap, pi - cap, pi - cap]))
+            gc_stop = np.hstack((gc_stop, [cap, cap, pi + cap, pi + cap]))
+        great_circles = _sample_curves(
+            np.zeros((len(gc_range), 3)),
+            np.tile(j, (len(gc_range), 1)),
+            np.stack(
+                (np.cos(gc_range), np.zeros(len(gc_range)), -np.sin(gc_range)),
+                axis=1,
+            ),
+            gc_start,
+            gc_stop,
+            n,
+            tolerance,
+            projection,
+        )
+        small_circles = _sample_curves(
+            j * np.cos(sc_range)[:, None],
+            k * np.sin(sc_range)[:, None],
+            i * np.sin(sc_range)[:, None],
+            0.0,
+            2 * pi,
+            n,
+            tolerance,
+            projection,
+        )
+        return list(great_circles), list(small_circles)
+
+    @staticmethod
+    def _net_lines(
+        projection, gc_spacing, sc_spacing, n, clean_caps, tolerance=None
+    ):
+        gc, sc = ProjectionPlot._net_grid(
+            gc_spacing, sc_spacing, n, clean_caps, tolerance, projection
+        )
+        return (
+            ProjectionPlot._project_lines(projection, gc),
+            ProjectionPlot._project_lines(projection, sc),
+        )
+
+    @classmethod
+    def net_lines(
+        cls,
+        projection,
+        gc_spacing=10.0,
+        sc_spacing=10.0,
+        n=360,
+        clean_caps=True,
+        tolerance=None,
+    ):
+        """Returns the projected great and small circle lines of the
+        reference net, see base_net, from net_cache when available.
+
+        Parameters:
+            projection: A ProjectionBase object or class.
+            tolerance: If given, n is ignored and the circles are sampled
+            adaptively so their chord error on the projection stays below
+            tolerance, see pixel_tolerance.
+        """
+        if isclass(projection):
+            projection = projection()
+        rotation = projection.rotation
+        key = (
+            type(projection).__name__,
+            None if rotation is None else tuple(float(r) for r in rotation),
+            float(gc_spacing),
+            float(sc_spacing),
+            int(n),
+            bool(clean_caps),
+            None if tolerance is None else float(tolerance),
+        )
+        stage = _stage_start()
+        lines = cls.net_cache.get(key)
+        cache_hits = int(lines is not None)
+        if lines is None:
+            lines = cls._net_lines(
+                projection, gc_spacing, sc_spacing, n, clean_caps, tolerance
+            )
+            for line in lines[0] + lines[1]:
+                line.flags.writeable = False
+            cls.net_cache.put(key, lines)
+        if stage is not None:
+            _stage_end(
+                "net_lines",
+                stage,
+                cache_hits=cache_hits,
+                lines=len(lines[0]) + len(lines[1]),
+            )
+        return lines
+
+    @classmethod
+    def warm_net_cache(cls, projections, rotations=(None,), **kwargs):
+        """Fills net_cache with the reference nets of every combination of
+        projections, as ProjectionBase classes, and rotations. Further
+        key word arguments are passed to net_lines."""
+        for projection in projections:
+            for rotation in rotations:
+                cls.net_lines(projection(rotation), **kwargs)
 
     def __init__(self, axis=None, projection=None, rotation=None):
         if projection is None:
@@ -562,12 +2335,13 @@ class ProjectionPlot(object):
     def plot_primitive(self):
         """Plots the primitive, center, NESW indicators and North if no
         rotation."""
+        from matplotlib.patches import Circle
+
         self.primitive = Circle(
             (0, 0),
             radius=1,
             edgecolor="black",
             fill=False,
-            clip_box="None",
             label="_nolegend_",
         )
         self.axis.add_patch(self.primitive)
@@ -580,6 +2354,18 @@ class ProjectionPlot(object):
                 x_cross, y_cross, "k+", markersize=8, label="_nolegend_"
             )
 
+    def pixel_tolerance(self, pixels=0.5):
+        """Returns the length in data units of a number of pixels on the
+        diagram as currently laid out, to be used as the tolerance of
+        adaptively sampled circles, as in base_net."""
+        # with equal aspect the wider data limits set the scale
+        box = self.axis.get_window_extent()
+        x_min, x_max = self.axis.get_xlim()
+        y_min, y_max = self.axis.get_ylim()
+        return pixels / min(
+            box.width / abs(x_max - x_min), box.height / abs(y_max - y_min)
+        )
+
     def as_points(self, vectors, **kwargs):
         """Plot points on the diagram. Accepts and passes aditional key word
         arguments to axis.plot."""
@@ -589,26 +2375,187 @@ class ProjectionPlot(object):
         options = ChainMap({}, kwargs, self.point_defaults)
         self.axis.plot(X, Y, linestyle="", **options)
 
+    @staticmethod
+    def _pad_lines(lines):
+        """stack a list of (n, 3) lines of different lengths, such as
+        adaptively sampled circles, padded with nan points, which are
+        clipped as outside the primitive. Returns None if the lines are
+        not all (n, 3) arrays."""
+        lines = [np.asarray(line, dtype=float) for line in lines]
+        if any(line.ndim != 2 or line.shape[1] != 3 for line in lines):
+            return None
+        stacked = np.full(
+            (len(lines), max(len(line) for line in lines), 3), np.nan
+        )
+        for padded, line in zip(stacked, lines):
+            padded[: len(line)] = line
+        return stacked
+
+    @staticmethod
+    def _project_lines(projection, lines, z_tol=0.1):
+        """rotates, clips, joins and projects a list of lines, or a stacked
+        (k, n, 3) array of them, into the (m, 2) lines to be plotted."""
+        stage = _stage_start()
+        try:
+            stacked = np.asarray(lines, dtype=float)
+        except (TypeError, ValueError):  # ragged lines or a generator
+            stacked = None
+            if isinstance(lines, (list, tuple)) and lines:
+                stacked = ProjectionPlot._pad_lines(lines)
+        if stacked is None or stacked.ndim != 3:
+            projected_lines = [
+                np.transpose(
+                    projection.direct(
+                        segment, invert_positive=False, rotate=False
+                    )
+                )
+                for line in lines
+                for segment in ProjectionPlot._join_segments(
+                    ProjectionPlot._clip_lines(
+                        np.dot(VectorSet(line), projection.R.T), z_tol
+                    )
+                )
+            ]
+        else:
+            rotated = np.dot(stacked, projection.R.T)
+            inside = rotated[..., 2] < z_tol
+            projected = np.empty(rotated.shape[:-1] + (2,))
+            projected[inside] = np.transpose(
+                projection.direct(
+                    rotated[inside], invert_positive=False, rotate=False
+                )
+            )
+            circle, start, stop = ProjectionPlot._clip_segments(rotated, z_tol)
+            segments = [
+                projected[c, i:j] for c, i, j in zip(circle, start, stop)
+            ]
+            ends = np.stack(
+                (rotated[circle, start], rotated[circle, stop - 1]), axis=1
+            )
+            projected_lines = []
+            for group in np.split(
+                np.arange(len(circle)), np.flatnonzero(np.diff(circle)) + 1
+            ):
+                if len(group) == 1:
+                    projected_lines.append(segments[group[0]])
+                    continue
+                group_ends = ends[group].reshape(-1, 3)
+                for chain in ProjectionPlot._join_chains(group_ends):
+                    projected_lines.append(
+                        ProjectionPlot._concatenate_chain(
+                            segments, [(group[i], f) for i, f in chain]
+                        )
+                    )
+        if stage is not None:
+            _stage_end(
+                "project_lines",
+                stage,
+                lines=len(projected_lines),
+                vertices=sum(len(line) for line in projected_lines),
+                bytes=sum(line.nbytes for line in projected_lines),
+            )
+        return projected_lines
+
     def as_lines(self, lines, **kwargs):
-        """plot a list of lines"""
+        """plot a list of lines, or a stacked (k, n, 3) array of them"""
         # use the default values if not user input
         # https://stackoverflow.com/a/6354485/1457481
         options = ChainMap({}, kwargs, self.line_defaults)
-        # should change this for better support of huge data
-        projected_lines = [
-            np.transpose(
-                self.projection.direct(
-                    segment, invert_positive=False, rotate=False
-                )
-            )
-            for circle in lines
-            for segment in self._join_segments(
-                self._clip_lines(np.dot(VectorSet(circle), self.projection.R.T))
-            )
-        ]
+        self._add_lines(self._project_lines(self.projection, lines), options)
+
+    def _add_lines(self, projected_lines, options):
+        from matplotlib.collections import LineCollection
+
+        stage = _stage_start()
         circle_collection = LineCollection(projected_lines, **options)
         circle_collection.set_clip_path(self.primitive)
         self.axis.add_collection(circle_collection)
+        if stage is not None:
+            _stage_end(
+                "collection",
+                stage,
+                lines=len(projected_lines),
+                vertices=sum(len(line) for line in projected_lines),
+            )
+
+    def _contour_weights(self, nodes, resolution, axial, z_tol=0.1):
+        """linear interpolation weights from the counting nodes to the
+        resolution x resolution raster of as_contours. The nodes visible
+        in this projection and rotation are triangulated once, and the
+        enclosing triangle and barycentric weights of each raster point
+        are kept in contour_cache. Returns (vertices, weights, inside),
+        where vertices index the nodes of the triangles around the raster
+        points flagged in inside."""
+        stage = _stage_start()
+        nodes = np.reshape(np.asarray(nodes, dtype=float), (-1, 3))
+        rotation = self.projection.rotation
+        key = (
+            type(self.projection).__name__,
+            None if rotation is None else tuple(float(r) for r in rotation),
+            int(resolution),
+            bool(axial),
+            hashlib.sha1(np.ascontiguousarray(nodes).tobytes()).hexdigest(),
+        )
+        weights = self.contour_cache.get(key)
+        if weights is not None:
+            if stage is not None:
+                _stage_end("contour_weights", stage, cache_hits=1)
+            return weights
+        from matplotlib.tri import Triangulation
+
+        index = np.arange(len(nodes))
+        if axial:  # the counts hold for the opposite nodes too
+            nodes = np.vstack((nodes, -nodes))
+            index = np.concatenate((index, index))
+        visible = np.dot(nodes, self.projection.R.T)[:, 2] < z_tol
+        X, Y = self.projection.direct(nodes[visible], invert_positive=False)
+        points = np.column_stack((X, Y))
+        # nodes on the primitive and their opposites may coincide
+        unique = np.unique(np.round(points, 9), axis=0, return_index=True)[1]
+        points, index = points[unique], index[visible][unique]
+        triangulation = Triangulation(points[:, 0], points[:, 1])
+        xi = np.linspace(-1.1, 1.1, resolution)
+        XI, YI = np.meshgrid(xi, xi)
+        triangles = triangulation.get_trifinder()(XI, YI)
+        inside = triangles >= 0
+        vertices = triangulation.triangles[triangles[inside]]
+        a, b, c = np.transpose(points[vertices], (1, 0, 2))
+        p = np.column_stack((XI[inside], YI[inside]))
+        v0, v1, v2 = b - a, c - a, p - a
+        d00 = np.einsum("ij,ij->i", v0, v0)
+        d01 = np.einsum("ij,ij->i", v0, v1)
+        d11 = np.einsum("ij,ij->i", v1, v1)
+        d20 = np.einsum("ij,ij->i", v2, v0)
+        d21 = np.einsum("ij,ij->i", v2, v1)
+        denominator = d00 * d11 - d01 * d01
+        wb = (d11 * d20 - d01 * d21) / denominator
+        wc = (d00 * d21 - d01 * d20) / denominator
+        weights = (
+            index[vertices],
+            np.column_stack((1.0 - wb - wc, wb, wc)),
+            inside,
+        )
+        self.contour_cache.put(key, weights)
+        if stage is not None:
+            _stage_end(
+                "contour_weights",
+                stage,
+                cache_hits=0,
+                nodes=len(points),
+                points=len(p),
+                bytes=sum(w.nbytes for w in weights),
+            )
+        return weights
+
+    def _clip_contours(self, contours):
+        from matplotlib.collections import Collection
+
+        # matplotlib >= 3.8 contour sets are collections themselves
+        if isinstance(contours, Collection):
+            contours.set_clip_path(self.primitive)
+        else:
+            for collection in contours.collections:
+                collection.set_clip_path(self.primitive)
 
     def as_contours(
         self,
@@ -620,11 +2567,17 @@ class ProjectionPlot(object):
         percentage=True,
         contour_mode="fillover",
         resolution=250,
+        axial=True,
         **kwargs
     ):
         """Plot contours of a spherical count. Parameters are the counting
         nodes, the actual counts and the number of data points. Returns the
-        matplotlib contour object for creating colorbar."""
+        matplotlib contour object for creating colorbar. If axial, the
+        counts also hold for the opposite of each node, as for the ones
+        of SphericalGrid. The interpolation from the nodes to the contoured
+        raster is cached, see _contour_weights, so contouring other counts
+        on the same nodes is cheap."""
+        count = np.asarray(count, dtype=float)
         if percentage:
             count = 100.0 * count / n_data
         if minmax:
@@ -632,9 +2585,12 @@ class ProjectionPlot(object):
         else:
             intervals = np.linspace(0, count.max(), n_contours)
         xi = yi = np.linspace(-1.1, 1.1, resolution)
-        # maybe preselect nodes here on z tolerance
-        X, Y = self.projection.direct(nodes, invert_positive=False)
-        zi = griddata(X, Y, count, xi, yi, interp="linear")
+        vertices, weights, inside = self._contour_weights(
+            nodes, resolution, axial
+        )
+        stage = _stage_start()
+        zi = np.ma.masked_all((resolution, resolution))
+        zi[inside] = np.einsum("ij,ij->i", count[vertices], weights)
         # use the default values if not user input
         # https://stackoverflow.com/a/6354485/1457481
         options = ChainMap({}, kwargs, self.contour_defaults)
@@ -642,12 +2598,12 @@ class ProjectionPlot(object):
         contour_fill, contour_lines = None, None
         if contour_mode in ("fillover", "fill"):
             contour_fill = self.axis.contourf(xi, yi, zi, intervals, **options)
-            for collection in contour_fill.collections:
-                collection.set_clip_path(self.primitive)
+            self._clip_contours(contour_fill)
         if contour_mode != "fill":
             contour_lines = self.axis.contour(xi, yi, zi, intervals, **options)
-            for collection in contour_lines.collections:
-                collection.set_clip_path(self.primitive)
+            self._clip_contours(contour_lines)
+        if stage is not None:
+            _stage_end("contour", stage, points=int(inside.sum()))
 
         return contour_fill if contour_fill is not None else contour_lines
 
@@ -657,6 +2613,8 @@ class ProjectionPlot(object):
         X, Y = self.projection.direct(vector)
         txt = self.axis.text(X, Y, text, **options)
         if border is not None:
+            from matplotlib import patheffects
+
             txt.set_path_effects(
                 [
                     patheffects.withStroke(
@@ -675,15 +2633,39 @@ class ProjectionPlot(object):
         clean_caps=True,
         plot_cardinal_points=True,
         cardinal_options=None,
+        cache=True,
+        tolerance=None,
     ):
-        gc, sc = self._net_grid(gc_spacing, sc_spacing, n, clean_caps)
+        """Plots the reference net. Its projected lines are kept in
+        net_cache and reused by later calls with the same projection and
+        net parameters, unless cache is False. If tolerance is given, the
+        circles are sampled adaptively instead of with n points, see
+        pixel_tolerance."""
+        if cache:
+            gc, sc = self.net_lines(
+                self.projection,
+                gc_spacing,
+                sc_spacing,
+                n,
+                clean_caps,
+                tolerance,
+            )
+        else:
+            gc, sc = self._net_lines(
+                self.projection,
+                gc_spacing,
+                sc_spacing,
+                n,
+                clean_caps,
+                tolerance,
+            )
         gc_options = {} if gc_options is None else gc_options
         sc_options = {} if sc_options is None else sc_options
         cardinal_options = {} if cardinal_options is None else cardinal_options
         gc_options = ChainMap({}, gc_options, self.net_gc_defaults)
-        self.as_lines(gc, **gc_options)
+        self._add_lines(gc, gc_options)
         sc_options = ChainMap({}, sc_options, self.net_sc_defaults)
-        self.as_lines(sc, **sc_options)
+        self._add_lines(sc, sc_options)
 
         cardinal_options = ChainMap(
             {}, cardinal_options, {"verticalalignment": "center"}
@@ -710,27 +2692,397 @@ class ProjectionPlot(object):
                 )
 
 
-def sample_fisher(mean_vector, kappa, n):
-    """Samples n vectors from von Mises-Fisher distribution."""
-    mean_vector = Vector(mean_vector)
-    direction_vector = mean_vector.direction_vector
-    dip_vector = mean_vector.dip_vector
-    kappa = kappa
-    theta_sample = np.random.uniform(0, 2 * pi, n)
-    alpha_sample = np.random.vonmises(0, kappa / 2.0, n)  # Why?
-    return VectorSet(
-        (
-            (
-                direction_vector[:, None] * np.cos(theta_sample)
-                + dip_vector[:, None] * np.sin(theta_sample)
-            )
-            * np.sin(alpha_sample)
-            + mean_vector[:, None] * np.cos(alpha_sample)
-        ).T
+# figure reused by the renders of each process, see render_batch
+_render_figure = None
+
+
+def _render_spec(spec, figsize=(6.0, 6.0), dpi=100):
+    """renders a single render_batch spec headless, on a figure reused
+    across calls, and returns the name of the written file."""
+    global _render_figure
+    if _render_figure is None:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        _render_figure = Figure()
+        FigureCanvasAgg(_render_figure)
+    figure = _render_figure
+    figure.clear()
+    figure.set_size_inches(spec.get("figsize", figsize))
+    plot = ProjectionPlot(
+        figure.add_subplot(1, 1, 1),
+        spec.get("projection"),
+        spec.get("rotation"),
+    )
+    net_options = spec.get("base_net")
+    if net_options is not None and net_options is not False:
+        plot.base_net(**({} if net_options is True else net_options))
+    for call in spec.get("calls", ()):
+        name, args, kwargs = call[0], (), {}
+        if len(call) > 1:
+            args = call[1]
+        if len(call) > 2:
+            kwargs = call[2]
+        getattr(plot, name)(*args, **kwargs)
+    figure.savefig(
+        spec["filename"], dpi=spec.get("dpi", dpi), **spec.get("savefig", {})
+    )
+    figure.clear()
+    return spec["filename"]
+
+
+def _render_spec_star(arguments):
+    return _render_spec(*arguments)
+
+
+def render_batch(
+    specs,
+    processes=None,
+    figsize=(6.0, 6.0),
+    dpi=100,
+    progress=None,
+    chunksize=1,
+    maxtasksperchild=None,
+):
+    """Renders a list of stereonets headless and writes them to files,
+    spread across a process pool. Each process draws on a single reused
+    figure, with the Agg canvas, so no interactive backend is needed.
+
+    Parameters:
+        specs: A list of dicts describing each plot, with keys:
+            filename: File to write, whose extension (png, svg, pdf...)
+            sets the format.
+            projection, rotation: Passed to ProjectionPlot.
+            base_net: True, or a dict of key word arguments for
+            ProjectionPlot.base_net, to plot the reference net first.
+            calls: A list of (method name, args, kwargs) tuples of
+            ProjectionPlot methods to call, such as
+            ("as_points", (data,), {"c": "b"}). args and kwargs are
+            optional.
+            figsize, dpi, savefig: Optional figure size, resolution and
+            further key word arguments to savefig for this plot.
+        processes: Number of worker processes. If None, the number of
+        CPUs is used; if 1, the plots are rendered in this process.
+        figsize, dpi: Defaults for specs that don't set them.
+        progress: Optional callable, called as progress(done, total,
+        filename) after each plot is written.
+        chunksize: Number of specs sent to a worker at a time.
+        maxtasksperchild: Number of specs after which a worker process is
+        replaced, bounding the memory held by long runs.
+
+    Returns the list of written file names, in the order of specs.
+    """
+    specs = list(specs)
+    arguments = [(spec, figsize, dpi) for spec in specs]
+    filenames = []
+    if processes == 1:
+        results = map(_render_spec_star, arguments)
+        pool = None
+    else:
+        from multiprocessing import Pool
+
+        pool = Pool(processes, maxtasksperchild=maxtasksperchild)
+        results = pool.imap(_render_spec_star, arguments, chunksize)
+    try:
+        for filename in results:
+            filenames.append(filename)
+            if progress is not None:
+                progress(len(filenames), len(specs), filename)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return filenames
+
+
+def _random_state(random_state):
+    """np.random.Generator for a seed, SeedSequence or Generator, or the
+    global NumPy random state if None."""
+    if random_state is None:
+        return np.random
+    return np.random.default_rng(random_state)
+
+
+def sample_fisher(mean_vector, kappa, n, random_state=None):
+    """Samples n vectors from the von Mises-Fisher distribution around
+    each mean vector, exactly, by inverting the cumulative distribution
+    of the cosine w of the angle to the mean, in 3 dimensions:
+    w = 1 + log(u + (1 - u) exp(-2 kappa)) / kappa, for u uniform.
+
+    Parameters:
+        mean_vector: A (3,) mean vector, or a (m, 3) array-like of them.
+        kappa: Concentration, either a single value or one per mean
+        vector. kappa = 0 gives the uniform distribution.
+        n: Number of vectors sampled around each mean vector.
+        random_state: Seed, np.random.SeedSequence or np.random.Generator
+        to draw from. If None the global NumPy random state is used.
+
+    Returns a (n, 3) VectorSet for a single mean vector, else a
+    (m, n, 3) one.
+    """
+    random_state = _random_state(random_state)
+    means = np.reshape(np.asarray(mean_vector, dtype=float), (-1, 3))
+    means = means / np.linalg.norm(means, axis=1)[:, None]
+    kappa = np.broadcast_to(
+        np.reshape(np.asarray(kappa, dtype=float), (-1, 1)), (len(means), 1)
+    )
+    u = 1.0 - random_state.uniform(size=(len(means), n))
+    theta = random_state.uniform(0, 2 * pi, size=(len(means), n))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        w = np.where(
+            kappa > 0,
+            1.0 + np.log1p((1.0 - u) * np.expm1(-2.0 * kappa)) / kappa,
+            2.0 * u - 1.0,
+        )
+    w = np.clip(w, -1.0, 1.0)
+    means = VectorSet(means)
+    direction = np.asarray(means.direction_vector)[:, None, :]
+    dip = np.asarray(means.dip_vector)[:, None, :]
+    around = (
+        direction * np.cos(theta)[..., None] + dip * np.sin(theta)[..., None]
     )
+    samples = (
+        around * np.sqrt(1.0 - w * w)[..., None]
+        + np.asarray(means)[:, None, :] * w[..., None]
+    )
+    if np.ndim(mean_vector) == 1:
+        samples = samples[0]
+    return VectorSet(samples)
+
+
+def sample_uniform(n, random_state=None):
+    """Sample n vectors for the uniform distribution on the sphere.
+
+    Parameters:
+        n: Number of vectors.
+        random_state: Seed, np.random.SeedSequence or np.random.Generator
+        to draw from. If None the global NumPy random state is used.
+    """
+    samples = _random_state(random_state).standard_normal(size=(n, 3))
+    return VectorSet(samples / np.linalg.norm(samples, axis=1)[:, None])
+
+
+# function and shared arguments of the chunks run by a worker process,
+# set once by the pool initializer, see _seeded_chunks.
+_chunk_arguments = None
+
+
+def _set_chunk_arguments(function, shared):
+    global _chunk_arguments
+    _chunk_arguments = function, shared
+
+
+def _run_chunk(task):
+    count, seed = task
+    function, shared = _chunk_arguments
+    return function(*(shared + (count, np.random.default_rng(seed))))
+
+
+def _seeded_chunks(function, shared, n, chunk_size, seed, processes):
+    """yields function(*shared, count, rng) for chunks of count of n
+    items, in order, each rng drawing from its own child stream spawned
+    from seed, so the chunks are the same whatever the number of
+    processes. The shared arguments are sent to each worker once."""
+    counts = [chunk_size] * (n // chunk_size)
+    if n % chunk_size:
+        counts.append(n % chunk_size)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    tasks = list(zip(counts, seed.spawn(len(counts))))
+    if processes == 1:
+        for count, child in tasks:
+            rng = np.random.default_rng(child)
+            yield function(*(shared + (count, rng)))
+        return
+    from multiprocessing import Pool
+
+    pool = Pool(processes, _set_chunk_arguments, (function, shared))
+    try:
+        for chunk in pool.imap(_run_chunk, tasks):
+            yield chunk
+    finally:
+        # stops the workers early if the generator is abandoned
+        pool.terminate()
+
 
-def sample_uniform(n):
-    """Sample n vectors for the uniform distribution on the sphere."""
-    samples = np.random.normal(size=(n, 3))
-    return VectorSet(
-        samples / np.linalg.norm(samples, axis=1)[:, None])
+def _sample_chunk(sampler, args, n, rng):
+    return sampler(*args, n=n, random_state=rng)
+
+
+def sample_chunks(
+    sampler, args, n, chunk_size=1000000, seed=None, processes=1
+):
+    """Generates n samples in chunks, each drawn from its own child stream
+    spawned from seed with np.random.SeedSequence, so that the chunks are
+    the same whatever the number of processes generating them.
+
+    Parameters:
+        sampler: A sampling function taking n and random_state key word
+        arguments, such as sample_fisher or sample_uniform.
+        args: Tuple of the further arguments of sampler, such as
+        (mean_vector, kappa) for sample_fisher.
+        n: Total number of samples, for each mean vector of
+        sample_fisher.
+        chunk_size: Number of samples in each chunk.
+        seed: Seed or np.random.SeedSequence of the streams. If None,
+        fresh entropy is used.
+        processes: Number of worker processes. If None, the number of
+        CPUs is used; if 1, the chunks are sampled in this process.
+
+    Yields the chunks in order.
+    """
+    return _seeded_chunks(
+        _sample_chunk, (sampler, tuple(args)), n, chunk_size, seed, processes
+    )
+
+
+# converters between attitudes and direction cosines for each kind of data
+# read by read_attitudes and written by write_attitudes.
+ATTITUDE_KINDS = {
+    "line": (dcos_line, sphere_line),  # trend/plunge
+    "plane": (dcos_plane, sphere_plane),  # dip direction/dip, as poles
+    "strike": (dcos_strike, sphere_strike),  # right hand rule strike/dip
+}
+
+
+def read_attitudes(
+    fname,
+    kind="line",
+    chunk_size=100000,
+    delimiter=None,
+    skiprows=0,
+    usecols=(0, 1),
+    comments="#",
+):
+    """Returns a generator of VectorSet blocks with the direction cosines
+    of the attitudes in a delimited text file, read chunk_size rows at a
+    time.
+
+    Parameters:
+        fname: Name of the file to read.
+        kind: Either "line" for trend/plunge, "plane" for dip
+        direction/dip, or "strike" for right hand rule strike/dip. Planes
+        are converted to their poles.
+        chunk_size: Number of rows per block.
+        delimiter, skiprows, usecols, comments: As in np.loadtxt.
+    """
+    to_dcos = ATTITUDE_KINDS[kind][0]
+    with open(fname) as f:
+        for _ in islice(f, skiprows):
+            pass
+        while True:
+            lines = list(islice(f, chunk_size))
+            if not lines:
+                break
+            # skip chunks without data, which np.loadtxt warns about
+            lines = [
+                line
+                for line in lines
+                if (line.split(comments)[0] if comments else line).strip()
+            ]
+            if not lines:
+                continue
+            attitudes = np.loadtxt(
+                lines,
+                delimiter=delimiter,
+                usecols=usecols,
+                comments=comments,
+                ndmin=2,
+            )
+            yield VectorSet(to_dcos(attitudes))
+
+
+def write_attitudes(
+    fname, data, kind="line", chunk_size=100000, delimiter=",", fmt="%.2f"
+):
+    """Writes direction cosines to a delimited text file of attitudes,
+    chunk_size rows at a time.
+
+    Parameters:
+        fname: Name of the file to write.
+        data: An (n, 3) array-like, which may be memory-mapped, or an
+        iterable of such blocks, as returned by read_attitudes.
+        kind: Either "line", "plane" or "strike", see read_attitudes.
+        chunk_size: Number of rows converted at a time for arrays.
+        delimiter, fmt: As in np.savetxt.
+    """
+    to_attitude = ATTITUDE_KINDS[kind][1]
+    if isinstance(data, np.ndarray):
+        data = np.reshape(data, (-1, 3))
+        blocks = (
+            data[i : i + chunk_size] for i in range(0, len(data), chunk_size)
+        )
+    else:
+        blocks = data
+    with open(fname, "w") as f:
+        for block in blocks:
+            np.savetxt(f, to_attitude(block), fmt=fmt, delimiter=delimiter)
+
+
+def load_attitudes(fname, kind="line", cache=None, mmap_mode="r", **kwargs):
+    """Loads a delimited text file of attitudes as a VectorSet of direction
+    cosines.
+
+    Parameters:
+        fname: Name of the file to read.
+        kind: Either "line", "plane" or "strike", see read_attitudes.
+        cache: Name of a .npy file caching the direction cosines. It is
+        created if missing, older than fname or written with other
+        conversion parameters (kind and the arguments of read_attitudes,
+        kept in a cache + ".params" file), and loaded otherwise, skipping
+        the parsing. If None no cache is used. The text is then parsed in
+        chunks into the cache, so the data is never fully held in memory.
+        mmap_mode: Mode used to load the cache, as in np.load. Defaults to
+        memory-mapped read only.
+        **kwargs: Passed to read_attitudes.
+    """
+    blocks = read_attitudes(fname, kind, **kwargs)
+    if cache is None:
+        blocks = list(blocks)
+        if not blocks:
+            return VectorSet(np.empty((0, 3)))
+        return VectorSet(np.concatenate(blocks))
+    arguments = signature(read_attitudes).bind(fname, kind, **kwargs)
+    arguments.apply_defaults()
+    params = arguments.arguments
+    del params["fname"], params["chunk_size"]  # don't change the result
+    if params["usecols"] is not None:
+        params["usecols"] = tuple(np.atleast_1d(params["usecols"]).tolist())
+    params = repr(sorted(params.items()))
+    params_name = cache + ".params"
+    stale = not os.path.exists(cache) or (
+        os.path.getmtime(cache) < os.path.getmtime(fname)
+    )
+    if not stale:
+        try:
+            with open(params_name) as f:
+                stale = f.read() != params
+        except IOError:
+            stale = True
+    if stale:
+        # the number of rows is only known after parsing, so the blocks
+        # go to a raw file first and are then copied into the .npy file
+        raw_name = cache + ".part"
+        n = 0
+        with open(raw_name, "wb") as raw:
+            for block in blocks:
+                np.ascontiguousarray(block, dtype=float).tofile(raw)
+                n += len(block)
+        # written aside and then moved, so arrays still mapping an
+        # older cache keep their data
+        out = np.lib.format.open_memmap(
+            cache + ".tmp", mode="w+", dtype=float, shape=(n, 3)
+        )
+        if n:
+            raw = np.memmap(raw_name, dtype=float, mode="r", shape=(n, 3))
+            step = _block_rows(3)
+            for i in range(0, n, step):
+                out[i : i + step] = raw[i : i + step]
+            del raw
+        out.flush()
+        del out
+        os.remove(raw_name)
+        os.replace(cache + ".tmp", cache)
+        with open(params_name, "w") as f:
+            f.write(params)
+    return VectorSet(np.load(cache, mmap_mode=mmap_mode))